@@ -0,0 +1,62 @@
+"""
+Compare serialization of bookmark lists with BookmarkSerializer and with BookmarkListSerializer.
+
+Rows are built in memory, so no database is needed. Run from app directory:
+    python -m benchmarks.bookmark_serialization
+"""
+import os
+import timeit
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from bookmarks.models import Bookmark  # noqa: E402
+from bookmarks.serializers import BookmarkListSerializer, BookmarkSerializer  # noqa: E402
+
+ROWS = 10_000
+
+
+def make_bookmarks(count: int) -> list:
+    now = timezone.now()
+    return [
+        Bookmark(id=i, created_at=now - timedelta(seconds=i), updated_at=now, page_title=f"Page {i}",
+                 description="Lorem ipsum dolor sit amet " * 4, page_url=f"https://example.com/{i}",
+                 page_type=Bookmark.PageTypeEnum.ARTICLE, image_url=f"https://example.com/{i}.png",
+                 status=Bookmark.StatusEnum.READY, user_id=1)
+        for i in range(1, count + 1)
+    ]
+
+
+def to_row(bookmark: Bookmark, columns: tuple) -> dict:
+    return {column: bookmark.serializable_value(column) for column in columns}
+
+
+def main() -> None:
+    bookmarks = make_bookmarks(ROWS)
+    list_serializer = BookmarkListSerializer()
+    rows = [to_row(bookmark, list_serializer.columns) for bookmark in bookmarks]
+
+    def model_serializer() -> list:
+        return BookmarkSerializer(bookmarks, many=True).data
+
+    def values_serializer() -> list:
+        return BookmarkListSerializer().to_representation(rows)
+
+    assert JSONRenderer().render(model_serializer()) == JSONRenderer().render(values_serializer())
+
+    print(f"{'serializer':>22} {'time, ms':>10}")
+    results = {}
+    for name, serialize in (("BookmarkSerializer", model_serializer), ("BookmarkListSerializer", values_serializer)):
+        results[name] = min(timeit.repeat(serialize, number=1, repeat=5))
+        print(f"{name:>22} {results[name] * 1000:>10.2f}")
+    print(f"speedup: {results['BookmarkSerializer'] / results['BookmarkListSerializer']:.1f}x on {ROWS} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare login throughput with different password hashers.
+
+Every login verifies the password in the thread pool of async login view, so the numbers show how many
+logins per second one process can serve and how long they wait under a burst. Database isn't used,
+hashers which libraries aren't installed are skipped. Run from app directory:
+    python -m benchmarks.login_throughput
+"""
+import asyncio
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.hashers import get_hasher, make_password  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from users.services import UserAuthService, password_hasher_executor  # noqa: E402
+
+LOGINS = 200
+CONCURRENCY = 32
+PASSWORD = "password123"
+
+
+async def login(encoded: str) -> float:
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    is_correct, _ = await loop.run_in_executor(
+        password_hasher_executor, UserAuthService.verify_password, PASSWORD, encoded)
+    assert is_correct
+    return time.perf_counter() - started
+
+
+async def burst(encoded: str) -> tuple:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited_login() -> float:
+        async with semaphore:
+            return await login(encoded)
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(limited_login() for _ in range(LOGINS)))
+    return LOGINS / (time.perf_counter() - started), statistics.quantiles(latencies, n=100)[98]
+
+
+def main() -> None:
+    print(f"{LOGINS} logins, {CONCURRENCY} concurrent, {settings.PASSWORD_HASHER_WORKERS} hashing threads")
+    print(f"{'hasher':>8} {'logins/s':>10} {'p99, ms':>10}")
+    for name, hasher in settings.PASSWORD_HASHER_CLASSES.items():
+        with override_settings(PASSWORD_HASHERS=[hasher]):
+            if get_hasher().library is not None:  # pbkdf2 doesn't need one
+                try:
+                    get_hasher()._load_library()
+                except ValueError:
+                    print(f"{name:>8} skipped, library is not installed")
+                    continue
+            encoded = make_password(PASSWORD)
+            rps, p99 = asyncio.run(burst(encoded))
+        print(f"{name:>8} {rps:>10.1f} {p99 * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare metadata extraction with full BeautifulSoup parse and with streaming <head> parser.
+
+Run from app directory:
+    python -m benchmarks.metadata_extraction
+"""
+import gc
+import timeit
+import tracemalloc
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+from bookmarks.parsers import extract_head_metadata
+
+CHUNK_SIZE = 16 * 1024
+HEAD = """<!DOCTYPE html><html><head>
+<title>Benchmark page</title>
+<meta property="og:title" content="Benchmark page">
+<meta property="og:description" content="Page with a large body">
+<meta property="og:image" content="https://example.com/image.png">
+<meta property="og:url" content="https://example.com/benchmark">
+<meta property="og:type" content="article">
+</head>"""
+PARAGRAPH = "<div class='post'><p>Lorem ipsum <a href='https://example.com/'>dolor</a> sit amet.</p></div>\n"
+
+
+def make_page(size: int) -> bytes:
+    body = PARAGRAPH * (size // len(PARAGRAPH))
+    return f"{HEAD}<body>{body}</body></html>".encode()
+
+
+def beautiful_soup(content: bytes) -> tuple:
+    raw_data = BeautifulSoup(content, "html.parser")
+    return tuple(raw_data.find("meta", property=f"og:{name}")["content"]
+                 for name in ("title", "description", "image", "url", "type"))
+
+
+def streaming(content: bytes) -> tuple:
+    chunks = (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+    metadata = extract_head_metadata(chunks)
+    return tuple(metadata.get(f"og:{name}") for name in ("title", "description", "image", "url", "type"))
+
+
+def measure(extract: Callable[[bytes], tuple], content: bytes, repeat: int) -> tuple:
+    """Best time of `repeat` runs and peak memory allocated by one run"""
+    gc.collect()
+    elapsed = min(timeit.repeat(lambda: extract(content), number=1, repeat=repeat))
+
+    tracemalloc.start()
+    extract(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    print(f"{'page size':>10} {'parser':>14} {'time, ms':>10} {'peak memory, KiB':>18}")
+    for size in (100 * 1024, 1024 * 1024, 4 * 1024 * 1024):
+        content = make_page(size)
+        assert beautiful_soup(content) == streaming(content)
+        repeat = 3 if size > 1024 * 1024 else 10
+        for name, extract in (("BeautifulSoup", beautiful_soup), ("streaming", streaming)):
+            elapsed, peak = measure(extract, content, repeat)
+            print(f"{size // 1024:>8}Ki {name:>14} {elapsed * 1000:>10.2f} {peak / 1024:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from bookmarks.async_views import BookmarkAsyncView, BookmarkListCreateAsyncView
+
+urlpatterns = [
+    path("", BookmarkListCreateAsyncView.as_view(), name="async-bookmark-create"),
+    path("<int:pk>", BookmarkAsyncView.as_view(), name="async-bookmark"),
+]
@@ -0,0 +1,67 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from bookmarks.cache import BookmarkListCache, aget_list_version, payload_response
+from bookmarks.models import Bookmark
+from bookmarks.serializers import BookmarkCreateSerializer, BookmarkListFilterSerializer, BookmarkSerializer
+from bookmarks.services import BookmarkFilterService, BookmarkService
+from bookmarks.views import render_list_page
+from core.async_views import AsyncAPIView, json_response
+
+
+class BookmarkListCreateAsyncView(AsyncAPIView):
+    http_method_names = ("get", "post")
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        fields = BookmarkSerializer.get_requested_fields(request.GET)
+        filter_serializer = BookmarkListFilterSerializer(data=request.GET)
+        filter_serializer.is_valid(raise_exception=True)
+        bookmarks = BookmarkFilterService.filter(Bookmark.objects.filter(user=request.user),
+                                                 filter_serializer.validated_data)
+
+        list_cache = BookmarkListCache(request.user.id, request.GET, version=await aget_list_version(request.user.id))
+        # DRF paginator is sync, so only cache misses take a thread
+        build = sync_to_async(render_list_page)
+        payload = await list_cache.aget_or_build(lambda: build(Request(request), bookmarks, fields))
+        return payload_response(request, payload)
+
+    async def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Page is always fetched inline, waiting for it doesn't hold a thread here"""
+        serializer = BookmarkCreateSerializer(data=self.get_data(request))
+        serializer.is_valid(raise_exception=True)
+        bookmark = await BookmarkService.asave_bookmark(url=serializer.validated_data["url"], user=request.user)
+        return json_response(BookmarkSerializer(bookmark).data, status.HTTP_201_CREATED)
+
+
+class BookmarkAsyncView(AsyncAPIView):
+    http_method_names = ("get", "patch", "delete")
+
+    async def get(self, request: HttpRequest, pk: int, *args, **kwargs) -> HttpResponse:
+        fields = BookmarkSerializer.get_requested_fields(request.GET)
+        bookmarks = Bookmark.objects.filter(user=request.user)
+        if fields is not None:
+            bookmarks = bookmarks.only("id", *BookmarkSerializer.get_sources(fields))
+        bookmark = await self.get_object(bookmarks, pk)
+        return json_response(BookmarkSerializer(bookmark, fields=fields).data)
+
+    async def patch(self, request: HttpRequest, pk: int, *args, **kwargs) -> HttpResponse:
+        bookmark = await self.get_object(Bookmark.objects.filter(user=request.user), pk)
+        serializer = BookmarkSerializer(bookmark, data=self.get_data(request), partial=True)
+        serializer.is_valid(raise_exception=True)
+        await sync_to_async(serializer.save)()
+        return json_response(serializer.data)
+
+    async def delete(self, request: HttpRequest, pk: int, *args, **kwargs) -> HttpResponse:
+        bookmark = await self.get_object(Bookmark.objects.filter(user=request.user), pk)
+        await bookmark.adelete()
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    async def get_object(bookmarks, pk: int) -> Bookmark:
+        try:
+            return await bookmarks.aget(pk=pk)
+        except Bookmark.DoesNotExist:
+            raise NotFound()
@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, QueryDict
+from django.utils.http import parse_etags
+from django_redis import get_redis_connection
+from rest_framework.renderers import JSONRenderer
+
+from core.cache import async_cache
+
+_batch = threading.local()
+
+
+def get_list_version_key(user_id: int) -> str:
+    return f"cached_bookmarks_{user_id}_version"
+
+
+def get_initial_list_version() -> int:
+    # if version was evicted, starting from current time keeps it bigger than versions of cached pages
+    return int(time.time() * 1000)
+
+
+def get_list_version(user_id: int) -> int:
+    version = cache.get(get_list_version_key(user_id))
+    if version is None:
+        cache.add(get_list_version_key(user_id), get_initial_list_version(), timeout=None)
+        version = cache.get(get_list_version_key(user_id))
+    return version
+
+
+async def aget_list_version(user_id: int) -> int:
+    version = await async_cache.get(get_list_version_key(user_id))
+    if version is None:
+        await async_cache.add(get_list_version_key(user_id), get_initial_list_version())
+        version = await async_cache.get(get_list_version_key(user_id))
+    return version
+
+
+def bump_list_versions(user_ids: Iterable[int]) -> None:
+    """All cached pages of bookmark lists of given users become outdated. Uses one Redis round trip"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    initial_version = get_initial_list_version()
+    with get_redis_connection("default").pipeline(transaction=False) as pipeline:
+        for user_id in user_ids:
+            key = cache.make_key(get_list_version_key(user_id))
+            pipeline.set(key, initial_version, nx=True)
+            pipeline.incr(key)
+        pipeline.execute()
+
+
+def bump_list_version(user_id: int) -> None:
+    bump_list_versions([user_id])
+
+
+def invalidate_list_cache(user_id: int) -> None:
+    """Bump version of user's list now, or at the end of batch_list_invalidation block"""
+    user_ids = getattr(_batch, "user_ids", None)
+    if user_ids is None:
+        bump_list_version(user_id)
+    else:
+        user_ids.add(user_id)
+
+
+@contextmanager
+def batch_list_invalidation() -> Iterator[None]:
+    """
+    Inside the block model signals only collect user ids, their lists are invalidated at once on exit.
+    Use it around queryset delete and other writes which touch bookmarks of many users.
+    """
+    if getattr(_batch, "user_ids", None) is not None:
+        yield
+        return
+    _batch.user_ids = set()
+    try:
+        yield
+    finally:
+        user_ids, _batch.user_ids = _batch.user_ids, None
+        bump_list_versions(user_ids)
+
+
+class BookmarkListCache:
+    """
+    Pages of user's bookmark list are cached under keys with current version of the list, writes only bump
+    the version. On miss one request rebuilds the page under the lock, others get the previous payload.
+    """
+
+    def __init__(self, user_id: int, query_params: QueryDict, namespace: str = "",
+                 version: Optional[int] = None) -> None:
+        """
+        Namespace separates payloads of different endpoints built from the same list, e.g. facets.
+        Async views pass version of the list read by `aget_list_version`.
+        """
+        query_hash = hashlib.md5(f"{namespace}{query_params.urlencode()}".encode()).hexdigest()
+        if version is None:
+            version = get_list_version(user_id)
+        self.key = f"cached_bookmarks_{user_id}_v{version}_{query_hash}"
+        self.stale_key = f"cached_bookmarks_{user_id}_stale_{query_hash}"
+        self.lock_key = f"cached_bookmarks_{user_id}_lock_{query_hash}"
+
+    def get_or_build(self, build: Callable[[], Any]) -> Any:
+        data = cache.get(self.key)
+        if data is not None:
+            return data
+        if not cache.add(self.lock_key, 1, timeout=settings.BOOKMARK_CACHE_LOCK_SECONDS):
+            stale_data = cache.get(self.stale_key)
+            if stale_data is not None:
+                return stale_data
+            return build()
+        try:
+            data = build()
+            cache.set_many({self.key: data, self.stale_key: data}, timeout=settings.CACHE_EXPIRATION_SECONDS)
+        finally:
+            cache.delete(self.lock_key)
+        return data
+
+    async def aget_or_build(self, build: Callable[[], Awaitable[Any]]) -> Any:
+        """get_or_build for async views"""
+        data = await async_cache.get(self.key)
+        if data is not None:
+            return data
+        if not await async_cache.add(self.lock_key, 1, timeout=settings.BOOKMARK_CACHE_LOCK_SECONDS):
+            stale_data = await async_cache.get(self.stale_key)
+            if stale_data is not None:
+                return stale_data
+            return await build()
+        try:
+            data = await build()
+            await async_cache.set_many({self.key: data, self.stale_key: data},
+                                       timeout=settings.CACHE_EXPIRATION_SECONDS)
+        finally:
+            await async_cache.delete(self.lock_key)
+        return data
+
+
+def render_payload(data: Any) -> dict:
+    """Render data to JSON once, so cache hits don't pay for unpickling and rendering again"""
+    body = JSONRenderer().render(data)
+    payload = {"body": body, "etag": f'"{hashlib.md5(body).hexdigest()}"', "content_encoding": None}
+    if settings.BOOKMARK_CACHE_GZIP:
+        payload.update(body=gzip.compress(body, compresslevel=6), content_encoding="gzip")
+    return payload
+
+
+def payload_response(request: HttpRequest, payload: dict) -> HttpResponse:
+    """
+    Gzip and identity representations of the payload differ in bytes, so each of them has its own strong ETag
+    and If-None-Match is matched against the one which would be served
+    """
+    content_encoding = payload["content_encoding"]
+    if content_encoding == "gzip" and "gzip" not in request.headers.get("Accept-Encoding", ""):
+        content_encoding = None
+    etag = payload["etag"] if content_encoding is None else f'{payload["etag"][:-1]}-{content_encoding}"'
+
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        body = payload["body"]
+        if content_encoding != payload["content_encoding"]:
+            body = gzip.decompress(body)
+        response = HttpResponse(body, content_type="application/json")
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    return response
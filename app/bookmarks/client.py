@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average and bursts of up to `capacity` requests"""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        while (delay := self.take()) > 0:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        """Wait for a token without blocking the event loop"""
+        while (delay := self.take()) > 0:
+            await asyncio.sleep(delay)
+
+    def take(self) -> float:
+        """Take a token if it's available, otherwise return seconds until it will be"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class BaseHttpClient:
+    """Token bucket per host and backoff of 429/503 responses, shared by sync and async clients"""
+    RETRY_STATUS_CODES = (429, 503)
+
+    def __init__(self, rate_limit: float, burst: int, retries: int, backoff_factor: float, max_backoff: float,
+                 max_tracked_hosts: int = 10000) -> None:
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_tracked_hosts = max_tracked_hosts
+        self.buckets = OrderedDict()
+        self.buckets_lock = threading.Lock()
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self.buckets_lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(rate=self.rate_limit, capacity=self.burst)
+                if len(self.buckets) > self.max_tracked_hosts:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(host)
+            return bucket
+
+    def get_retry_delay(self, response: Union[Response, httpx.Response], attempt: int) -> float:
+        """Honour Retry-After in seconds if the server sent it, otherwise use exponential backoff"""
+        retry_after = self.parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = self.backoff_factor * 2 ** attempt
+        return min(retry_after, self.max_backoff)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class HttpClient(BaseHttpClient):
+    """
+    Shared HTTP client for outbound fetches. Connections are kept alive in a pool per host,
+    every host has its own token bucket and responses with 429/503 are retried with backoff.
+    """
+
+    def __init__(self, rate_limit: float, burst: int, pool_hosts: int, pool_size: int, retries: int,
+                 backoff_factor: float, max_backoff: float, max_tracked_hosts: int = 10000) -> None:
+        super().__init__(rate_limit, burst, retries, backoff_factor, max_backoff, max_tracked_hosts)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        kwargs.setdefault("timeout", settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS)
+        bucket = self.get_bucket(urlsplit(url).netloc.lower())
+        attempt = 0
+        while True:
+            bucket.acquire()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.retries:
+                return response
+            response.close()
+            time.sleep(self.get_retry_delay(response, attempt))
+            attempt += 1
+
+
+class AsyncHttpClient(BaseHttpClient):
+    """
+    HttpClient for async views. Waiting for slow hosts holds no thread, so one event loop can run
+    hundreds of fetches at once, bounded by `max_connections`.
+    """
+
+    def __init__(self, rate_limit: float, burst: int, max_connections: int, retries: int, backoff_factor: float,
+                 max_backoff: float, max_tracked_hosts: int = 10000,
+                 transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        super().__init__(rate_limit, burst, retries, backoff_factor, max_backoff, max_tracked_hosts)
+        self.client = httpx.AsyncClient(limits=httpx.Limits(max_connections=max_connections),
+                                        follow_redirects=True, transport=transport)
+
+    async def request(self, method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """With `stream` the body isn't read, caller has to read or close the response"""
+        kwargs.setdefault("timeout", settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS)
+        bucket = self.get_bucket(urlsplit(url).netloc.lower())
+        attempt = 0
+        while True:
+            await bucket.aacquire()
+            response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+            if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.retries:
+                return response
+            await response.aclose()
+            await asyncio.sleep(self.get_retry_delay(response, attempt))
+            attempt += 1
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> HttpClient:
+    return HttpClient(
+        rate_limit=settings.BOOKMARK_HTTP_RATE_LIMIT,
+        burst=settings.BOOKMARK_HTTP_BURST,
+        pool_hosts=settings.BOOKMARK_HTTP_POOL_HOSTS,
+        pool_size=settings.BOOKMARK_HTTP_POOL_SIZE,
+        retries=settings.BOOKMARK_HTTP_RETRIES,
+        backoff_factor=settings.BOOKMARK_HTTP_BACKOFF_FACTOR,
+        max_backoff=settings.BOOKMARK_HTTP_MAX_BACKOFF_SECONDS,
+    )
+
+
+# httpx connections belong to the event loop they were opened in
+async_http_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    loop = asyncio.get_running_loop()
+    client = async_http_clients.get(loop)
+    if client is None:
+        client = async_http_clients[loop] = AsyncHttpClient(
+            rate_limit=settings.BOOKMARK_HTTP_RATE_LIMIT,
+            burst=settings.BOOKMARK_HTTP_BURST,
+            max_connections=settings.BOOKMARK_HTTP_ASYNC_MAX_CONNECTIONS,
+            retries=settings.BOOKMARK_HTTP_RETRIES,
+            backoff_factor=settings.BOOKMARK_HTTP_BACKOFF_FACTOR,
+            max_backoff=settings.BOOKMARK_HTTP_MAX_BACKOFF_SECONDS,
+        )
+    return client
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from bookmarks.models import Bookmark
+from bookmarks.utils import get_url_domain, get_url_hash
+
+
+class Command(BaseCommand):
+    help = "Fill url_hash and domain of bookmarks in chunks, walking the table by primary key"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--all", action="store_true",
+                            help="Recompute every bookmark, e.g. after canonicalization rules were changed")
+
+    def handle(self, *args, **options) -> None:
+        bookmarks = Bookmark.objects.order_by("id").only("id", "page_url", "url_hash", "domain")
+        if not options["all"]:
+            bookmarks = bookmarks.filter(Q(url_hash__isnull=True) | Q(domain__isnull=True))
+
+        last_id, updated = 0, 0
+        while chunk := list(bookmarks.filter(id__gt=last_id)[:options["chunk_size"]]):
+            for bookmark in chunk:
+                bookmark.url_hash = get_url_hash(bookmark.page_url)
+                bookmark.domain = get_url_domain(bookmark.page_url)
+            Bookmark.objects.bulk_update(chunk, fields=("url_hash", "domain"))
+            last_id = chunk[-1].id
+            updated += len(chunk)
+            self.stdout.write(f"{updated} bookmarks updated")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {updated} bookmarks updated"))
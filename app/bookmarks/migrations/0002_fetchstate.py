@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FetchState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=2048, unique=True)),
+                ("etag", models.CharField(blank=True, max_length=255, null=True)),
+                (
+                    "last_modified",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+                (
+                    "last_status",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("last_checked_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "content_hash",
+                    models.CharField(blank=True, max_length=64, null=True),
+                ),
+            ],
+        ),
+    ]
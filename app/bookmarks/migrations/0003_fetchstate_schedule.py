@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0002_fetchstate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookmark",
+            name="fetch_state",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="bookmarks",
+                to="bookmarks.fetchstate",
+            ),
+        ),
+        migrations.AddField(
+            model_name="fetchstate",
+            name="check_interval",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="fetchstate",
+            name="failure_count",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="fetchstate",
+            name="next_check_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0003_fetchstate_schedule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookmark",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("ready", "ready"),
+                    ("failed", "failed"),
+                ],
+                default="ready",
+                max_length=7,
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0005_bookmark_url_hash"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bookmark",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="bookmark_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0006_bookmark_user_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bookmark",
+            index=models.Index(
+                fields=["user", "page_type", "-created_at", "-id"],
+                name="bookmark_user_type_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:57
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('simple', coalesce({table}.page_title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({table}.description, '')), 'B')
+"""
+
+CREATE_SEARCH_VECTOR_SQL = f"""
+UPDATE bookmarks_bookmark SET search_vector = {SEARCH_VECTOR_SQL.format(table="bookmarks_bookmark")};
+
+CREATE INDEX bookmark_search_vector_idx ON bookmarks_bookmark USING gin (search_vector);
+
+CREATE FUNCTION bookmarks_bookmark_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_SQL.format(table="NEW")};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER bookmarks_bookmark_search_vector_trigger
+BEFORE INSERT OR UPDATE OF page_title, description ON bookmarks_bookmark
+FOR EACH ROW EXECUTE FUNCTION bookmarks_bookmark_search_vector_update();
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER bookmarks_bookmark_search_vector_trigger ON bookmarks_bookmark;
+DROP FUNCTION bookmarks_bookmark_search_vector_update();
+DROP INDEX bookmark_search_vector_idx;
+"""
+
+
+def create_search_vector(apps, schema_editor):
+    """GIN index and trigger exist on PostgreSQL only, other backends search with plain LIKE queries"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_VECTOR_SQL)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_VECTOR_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0007_bookmark_user_type_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookmark",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="bookmark",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=["search_vector"], name="bookmark_search_vector_idx"
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_vector, drop_search_vector),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0008_bookmark_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookmark",
+            name="domain",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="bookmark",
+            index=models.Index(
+                fields=["user", "domain", "-created_at", "-id"],
+                name="bookmark_user_domain_idx",
+            ),
+        ),
+    ]
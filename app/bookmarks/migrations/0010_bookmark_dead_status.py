@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookmarks", "0009_bookmark_domain"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fetchstate",
+            name="dead_since",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="bookmark",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("ready", "ready"),
+                    ("failed", "failed"),
+                    ("dead", "dead"),
+                ],
+                default="ready",
+                max_length=7,
+            ),
+        ),
+    ]
@@ -1,9 +1,16 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 
 from core.models import TimestampedModel
+from bookmarks.utils import get_url_domain, get_url_hash
 from users.models import User
 
 
+SEARCH_CONFIG = "simple"  # titles are in different languages, so words aren't stemmed
+
+
 class Bookmark(TimestampedModel):
     class PageTypeEnum(models.TextChoices):
         """Link Type"""
@@ -13,9 +20,58 @@ class Bookmark(TimestampedModel):
         MUSIC = "music", "music"
         VIDEO = "video", "video"
 
+    class StatusEnum(models.TextChoices):
+        """Metadata extraction state"""
+        PENDING = "pending", "pending"
+        READY = "ready", "ready"
+        FAILED = "failed", "failed"
+        DEAD = "dead", "dead"  # page is not found anymore, bookmark is kept until BOOKMARK_DEAD_PURGE_SECONDS pass
+
     page_title = models.CharField(max_length=150, blank=True, null=True)
     description = models.TextField(null=True, blank=True)
     page_url = models.URLField(max_length=255)
+    url_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # sha256 of canonical page_url
+    domain = models.CharField(max_length=255, null=True, blank=True)  # host of page_url without www.
     page_type = models.CharField(max_length=7, choices=PageTypeEnum.choices, default=PageTypeEnum.WEBSITE.value)
     image_url = models.URLField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=7, choices=StatusEnum.choices, default=StatusEnum.READY.value)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="users_collections")
+    fetch_state = models.ForeignKey("FetchState", on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name="bookmarks")
+    # weighted page_title and description, kept up to date by database trigger on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta(TimestampedModel.Meta):
+        indexes = [
+            # list of user's bookmarks, ordered for cursor pagination
+            models.Index(fields=["user", "-created_at", "-id"], name="bookmark_user_created_idx"),
+            models.Index(fields=["user", "page_type", "-created_at", "-id"], name="bookmark_user_type_created_idx"),
+            models.Index(fields=["user", "domain", "-created_at", "-id"], name="bookmark_user_domain_idx"),
+            GinIndex(fields=["search_vector"], name="bookmark_search_vector_idx"),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        url_hash = get_url_hash(self.page_url)
+        if self.url_hash is not None and "url_hash" not in self.get_deferred_fields() and url_hash != self.url_hash:
+            # state belongs to the previous url, link_bookmarks links the bookmark to the state of the new one
+            self.fetch_state = None
+        self.url_hash = url_hash
+        self.domain = get_url_domain(self.page_url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "page_url" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "url_hash", "domain", "fetch_state"}
+        super().save(*args, **kwargs)
+
+
+class FetchState(models.Model):
+    """Result of the last request to a normalized url, used for conditional revalidation"""
+    url = models.URLField(max_length=2048, unique=True)
+    etag = models.CharField(max_length=255, null=True, blank=True)
+    last_modified = models.CharField(max_length=64, null=True, blank=True)
+    last_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_checked_at = models.DateTimeField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    next_check_at = models.DateTimeField(default=timezone.now, db_index=True)
+    check_interval = models.PositiveIntegerField(null=True, blank=True)  # in seconds
+    failure_count = models.PositiveSmallIntegerField(default=0)
+    dead_since = models.DateTimeField(null=True, blank=True, db_index=True)  # first of consecutive "not found" responses
@@ -0,0 +1,67 @@
+from typing import Optional
+
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class BookmarkCursorPagination(CursorPagination):
+    """Keyset pagination, deep pages cost the same as the first one"""
+    ordering = ("-created_at", "-id")
+    page_size = settings.BOOKMARK_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.BOOKMARK_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view) -> tuple:
+        """Oldest first is served by the same indexes scanned backward"""
+        if request.query_params.get("ordering") == "created_at":
+            return ("created_at", "id")
+        return self.ordering
+
+
+class BookmarkSearchPagination(PageNumberPagination):
+    """
+    Search results are ordered by rank, which can't be used as a cursor. Counting all matches costs as much as
+    ranking them, so there is no total count: page is fetched with one extra row to know if the next one exists.
+    """
+    page_size = settings.BOOKMARK_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.BOOKMARK_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None) -> list:
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=self.page_number, message="Invalid page."))
+        offset = (self.page_number - 1) * page_size
+        results = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(results) > page_size
+        return results[:page_size]
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"].pop("count")
+        response_schema["required"] = ["results"]
+        return response_schema
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self) -> Optional[str]:
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
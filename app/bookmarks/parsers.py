@@ -0,0 +1,141 @@
+import codecs
+import hashlib
+import re
+from email.message import Message
+from html.parser import HTMLParser
+from typing import AsyncIterable, Iterable, Optional
+
+META_PREFIXES = ("og:", "twitter:")
+# browsers look for <meta charset> and <meta http-equiv="Content-Type"> in the first 1024 bytes of the page
+CHARSET_SNIFF_BYTES = 1024
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+
+
+class HeadMetaParser(HTMLParser):
+    """
+    Collects Open Graph and Twitter card meta tags and <title> of the page in one pass.
+    Parser is done as soon as </head> or <body> is met, everything after it is ignored.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = None
+        self.done = False
+        self.content_hash = None
+        self._title_parts = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if self.done:
+            return
+        if tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key.startswith(META_PREFIXES) and attrs.get("content") is not None:
+                self.meta.setdefault(key, attrs["content"])
+        elif tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts).strip()
+            self._title_parts = None
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if self._title_parts is not None and not self.done:
+            self._title_parts.append(data)
+
+    def get(self, *keys: str) -> Optional[str]:
+        """First found value of given meta tags"""
+        for key in keys:
+            if key in self.meta:
+                return self.meta[key]
+        return None
+
+
+def get_charset(content_type: Optional[str], default: Optional[str] = "utf-8") -> Optional[str]:
+    message = Message()
+    message["Content-Type"] = content_type or "text/html"
+    return lookup_charset(message.get_param("charset"), default)
+
+
+def lookup_charset(charset: Optional[str], default: Optional[str] = "utf-8") -> Optional[str]:
+    try:
+        return codecs.lookup(charset).name if charset else default
+    except LookupError:
+        return default
+
+
+def sniff_charset(head: bytes, default: str = "utf-8") -> str:
+    """Encoding declared by BOM or meta tag at the beginning of the page"""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = META_CHARSET_RE.search(head)
+    return lookup_charset(match.group(1).decode("ascii") if match else None, default)
+
+
+class HeadMetadataReader:
+    """
+    Feeds response body to HeadMetaParser chunk by chunk until <head> is parsed or max_bytes are read.
+    Without encoding from Content-Type header the first CHARSET_SNIFF_BYTES are buffered to find it in markup.
+    content_hash of the parser is sha256 of the bytes which were read.
+    """
+
+    def __init__(self, encoding: Optional[str] = "utf-8", max_bytes: int = 512 * 1024) -> None:
+        self.parser = HeadMetaParser()
+        self.decoder = None if encoding is None else self.get_decoder(encoding)
+        self.buffer = b""
+        self.content_hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.read = 0
+
+    @staticmethod
+    def get_decoder(encoding: str) -> codecs.IncrementalDecoder:
+        return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    def feed(self, chunk: bytes) -> bool:
+        """Returns True when the rest of the body isn't needed"""
+        chunk = chunk[:self.max_bytes - self.read]
+        self.read += len(chunk)
+        self.content_hash.update(chunk)
+        if self.decoder is None:
+            self.buffer += chunk
+            if len(self.buffer) < CHARSET_SNIFF_BYTES and self.read < self.max_bytes:
+                return False
+            chunk = self.start_decoding()
+        self.parser.feed(self.decoder.decode(chunk))
+        return self.parser.done or self.read >= self.max_bytes
+
+    def start_decoding(self) -> bytes:
+        self.decoder = self.get_decoder(sniff_charset(self.buffer[:CHARSET_SNIFF_BYTES]))
+        buffer, self.buffer = self.buffer, b""
+        return buffer
+
+    def close(self) -> HeadMetaParser:
+        if self.decoder is None:  # page is shorter than CHARSET_SNIFF_BYTES
+            buffer = self.start_decoding()
+            self.parser.feed(self.decoder.decode(buffer, final=True))
+        self.parser.content_hash = self.content_hash.hexdigest()
+        return self.parser
+
+
+def extract_head_metadata(chunks: Iterable[bytes], encoding: Optional[str] = "utf-8",
+                          max_bytes: int = 512 * 1024) -> HeadMetaParser:
+    reader = HeadMetadataReader(encoding, max_bytes)
+    for chunk in chunks:
+        if reader.feed(chunk):
+            break
+    return reader.close()
+
+
+async def aextract_head_metadata(chunks: AsyncIterable[bytes], encoding: Optional[str] = "utf-8",
+                                 max_bytes: int = 512 * 1024) -> HeadMetaParser:
+    reader = HeadMetadataReader(encoding, max_bytes)
+    async for chunk in chunks:
+        if reader.feed(chunk):
+            break
+    return reader.close()
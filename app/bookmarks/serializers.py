@@ -1,13 +1,113 @@
-from rest_framework import serializers
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import URLValidator
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from bookmarks.models import Bookmark
+from bookmarks.utils import get_url_domain
+
+PAGE_URL_MAX_LENGTH = Bookmark._meta.get_field("page_url").max_length
 
 
 class BookmarkCreateSerializer(serializers.Serializer):
-    url = serializers.URLField(required=True)
+    url = serializers.URLField(required=True, max_length=PAGE_URL_MAX_LENGTH)
+
+
+class BookmarkSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(required=True, max_length=255)
+
+
+class BookmarkFilterSerializer(serializers.Serializer):
+    page_type = serializers.ChoiceField(choices=Bookmark.PageTypeEnum.choices, required=False)
+    domain = serializers.CharField(required=False, max_length=255)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    status = serializers.ChoiceField(choices=Bookmark.StatusEnum.choices, required=False,
+                                     help_text="Dead bookmarks are listed only when requested")
+
+    def validate_domain(self, value: str) -> str:
+        return get_url_domain(f"//{value}")
+
+
+class BookmarkListFilterSerializer(BookmarkFilterSerializer):
+    ordering = serializers.ChoiceField(choices=("-created_at", "created_at"), required=False)
+
+
+class BookmarkExportSerializer(BookmarkFilterSerializer):
+    # "format" query parameter is taken by DRF format suffixes
+    export_format = serializers.ChoiceField(choices=("ndjson", "csv"), default="ndjson")
+    gzip = serializers.BooleanField(default=False, help_text="Compress exported file with gzip")
+
+
+class BookmarkImportSerializer(serializers.Serializer):
+    urls = serializers.ListField(child=serializers.URLField(max_length=PAGE_URL_MAX_LENGTH), required=False,
+                                 max_length=settings.BOOKMARK_IMPORT_MAX_URLS)
+    file = serializers.FileField(required=False, help_text="Bookmarks exported from browser in Netscape HTML format")
+
+    def validate(self, attrs: dict) -> dict:
+        urls = attrs.get("urls", [])
+        if "file" in attrs:
+            urls += self.parse_bookmarks_file(attrs["file"])
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            raise serializers.ValidationError("Provide list of urls or bookmarks file.")
+        max_urls = settings.BOOKMARK_IMPORT_MAX_URLS
+        if len(urls) > max_urls:
+            raise serializers.ValidationError(f"Ensure there are no more than {max_urls} urls.")
+        return {"urls": urls}
+
+    @staticmethod
+    def parse_bookmarks_file(file) -> List[str]:
+        """Links of Netscape bookmarks file, which aren't valid urls (e.g. javascript: bookmarklets) are skipped"""
+        validator = URLValidator()
+        urls = []
+        for link in BeautifulSoup(file.read(), "html.parser").find_all("a", href=True):
+            url = link["href"].strip()
+            try:
+                validator(url)
+            except DjangoValidationError:
+                continue
+            if len(url) <= PAGE_URL_MAX_LENGTH:
+                urls.append(url)
+        return urls
 
 
-class BookmarkSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Serializer, which output can be narrowed to `fields` requested by client in `?fields=` query parameter"""
+
+    def __init__(self, *args, fields: Optional[Sequence[str]] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(cls, query_params: QueryDict) -> Optional[tuple]:
+        value = query_params.get("fields")
+        if value is None:
+            return None
+        fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+        unknown_fields = [name for name in fields if name not in cls.Meta.fields]
+        if not fields or unknown_fields:
+            raise serializers.ValidationError(
+                {"fields": f"Choose from: {', '.join(cls.Meta.fields)}. Unknown: {', '.join(unknown_fields)}."})
+        return fields
+
+    @classmethod
+    def get_sources(cls, fields: Sequence[str]) -> tuple:
+        """Model fields, which have to be loaded from database to serialize `fields`"""
+        serializer_fields = cls().fields
+        return tuple(serializer_fields[name].source for name in fields)
+
+
+class BookmarkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Bookmark
         fields = (
@@ -19,8 +119,63 @@ class BookmarkSerializer(serializers.ModelSerializer):
             "page_url",
             "page_type",
             "image_url",
+            "status",
             "user",
         )
         read_only_fields = (
+            "status",
             "user",
         )
+
+
+class BookmarkListSerializer:
+    """
+    Read-only counterpart of `BookmarkSerializer(many=True)`, which builds the same output from `.values()` rows
+    with formatters precomputed once per list instead of per-field `to_representation` calls on model instances
+    """
+    serializer_class = BookmarkSerializer
+
+    def __init__(self, fields: Optional[Sequence[str]] = None) -> None:
+        fields = self.serializer_class(fields=fields).fields
+        self.sources = {name: field.source for name, field in fields.items()}
+        self.formatters = {name: self.get_formatter(field) for name, field in fields.items()}
+
+    @property
+    def columns(self) -> tuple:
+        """Arguments of `.values()`, related fields are selected by their primary keys"""
+        return tuple(self.sources.values())
+
+    def to_representation(self, rows: Iterable[dict]) -> List[dict]:
+        items = tuple((name, self.sources[name], formatter) for name, formatter in self.formatters.items())
+        return [
+            {name: None if row[source] is None else format_value(row[source]) for name, source, format_value in items}
+            for row in rows
+        ]
+
+    @classmethod
+    def get_formatter(cls, field: serializers.Field) -> Callable[[Any], Any]:
+        if isinstance(field, serializers.DateTimeField):
+            if getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601:
+                return cls.get_datetime_formatter(field)
+        elif isinstance(field, serializers.ChoiceField):
+            choices = field.choice_strings_to_values
+            return lambda value: choices.get(str(value), value)
+        elif isinstance(field, serializers.CharField):
+            return str
+        elif isinstance(field, serializers.IntegerField):
+            return int
+        elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            return lambda value: value
+        return field.to_representation
+
+    @staticmethod
+    def get_datetime_formatter(field: serializers.DateTimeField) -> Callable[[datetime], str]:
+        field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+
+        def format_datetime(value: datetime) -> str:
+            if field_timezone is not None and timezone.is_aware(value):
+                value = value.astimezone(field_timezone)
+            value = value.isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+        return format_datetime
@@ -1,15 +1,48 @@
-from typing import List
+import csv
+import hashlib
+import io
+import json
+import logging
+import random
+import time
+import uuid
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import httpx
 import requests
-from bs4 import BeautifulSoup
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, QuerySet
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.asyncio.lock import Lock as AsyncLock
+from redis.exceptions import LockError
+from redis.lock import Lock
 from requests import Response
-from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.exceptions import APIException, NotFound, ParseError
 
-from bookmarks.models import Bookmark
+from bookmarks.cache import batch_list_invalidation, bump_list_version, bump_list_versions
+from bookmarks.client import get_async_http_client, get_http_client
+from bookmarks.models import SEARCH_CONFIG, Bookmark, FetchState
+from bookmarks.parsers import HeadMetaParser, aextract_head_metadata, extract_head_metadata, get_charset
+from bookmarks.serializers import BookmarkListSerializer
+from bookmarks.utils import canonicalize_url, get_url_domain, get_url_hash
+from core.cache import async_cache
 from users.models import User
 
+logger = logging.getLogger(__name__)
+
 
 class BookmarkService:
+    CHUNK_SIZE = 16 * 1024
+
     @classmethod
     def save_bookmark(cls, url: str, user: User) -> Bookmark:
         page_title, description, image_url, page_url, page_type = cls.get_data(url)
@@ -19,30 +52,227 @@ class BookmarkService:
         return instance
 
     @classmethod
-    def get_data(cls, url: str) -> [str]:
-        """For parsing HTML and extracting content-meta tags. """
-        response = cls.request_data(url=url)
-        if response.status_code == 404:
+    async def asave_bookmark(cls, url: str, user: User) -> Bookmark:
+        page_title, description, image_url, page_url, page_type = await cls.aget_data(url)
+        return await Bookmark.objects.acreate(page_title=page_title, description=description, image_url=image_url,
+                                              page_url=page_url, page_type=page_type, user=user)
+
+    @classmethod
+    def create_pending_bookmark(cls, url: str, user: User) -> Bookmark:
+        """Save bookmark without metadata, it is filled later by fetch_bookmark_data task"""
+        return Bookmark.objects.create(page_url=url, status=Bookmark.StatusEnum.PENDING, user=user)
+
+    @classmethod
+    def fill_bookmark(cls, bookmark_id: int) -> Optional[Bookmark]:
+        """Fill metadata of pending bookmark. If page can't be fetched or parsed, bookmark is marked as failed"""
+        bookmark = Bookmark.objects.filter(id=bookmark_id, status=Bookmark.StatusEnum.PENDING).first()
+        if bookmark is None:
+            return None
+        try:
+            data, error = cls.fit_data(cls.get_data(bookmark.page_url))
+        except (NotFound, ParseError, requests.RequestException) as e:
+            data, error = None, repr(e)
+        except Exception:
+            # otherwise the task crashes and nothing takes the bookmark out of pending
+            logger.exception("Unexpected error while filling bookmark %s", bookmark_id)
+            data, error = None, "unexpected error"
+        if error is not None:
+            logger.warning("Failed to fetch data of bookmark %s: %s", bookmark_id, error)
+            bookmark.status = Bookmark.StatusEnum.FAILED
+            bookmark.save(update_fields=("status", "updated_at"))
+            return bookmark
+        page_title, description, image_url, page_url, page_type = data
+        bookmark.page_title = page_title
+        bookmark.description = description
+        bookmark.image_url = image_url
+        bookmark.page_url = page_url
+        bookmark.page_type = page_type
+        bookmark.status = Bookmark.StatusEnum.READY
+        bookmark.save()
+        return bookmark
+
+    @classmethod
+    def fit_data(cls, data: tuple) -> Tuple[tuple, Optional[str]]:
+        """
+        Metadata fitted into columns of Bookmark, or error message: long title is truncated,
+        too long image url is dropped, too long page url is an error.
+        """
+        page_title, description, image_url, page_url, page_type = data
+        if len(page_url) > Bookmark._meta.get_field("page_url").max_length:
+            return data, "Url of the page is too long."
+        if image_url is not None and len(image_url) > Bookmark._meta.get_field("image_url").max_length:
+            image_url = None
+        if page_title is not None:
+            page_title = page_title[:Bookmark._meta.get_field("page_title").max_length]
+        return (page_title, description, image_url, page_url, page_type), None
+
+    @classmethod
+    def get_data(cls, url: str, fetch: Optional[Callable[[str], tuple]] = None) -> [str]:
+        """
+        Metadata of the page from cache. On cache miss only one process fetches the page while others
+        wait for the lock and then read its result. 404 and parse errors are cached for a shorter time.
+        Page is fetched by `fetch`, fetch_data by default.
+        """
+        cache_key = cls.get_metadata_cache_key(url)
+        cached_data = cache.get(cache_key)
+        if cached_data is None:
+            lock = cache.lock(f"{cache_key}_lock", timeout=cls.get_fetch_lock_timeout())
+            acquired = lock.acquire(blocking_timeout=settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS)
+            try:
+                cached_data = cache.get(cache_key) if acquired else None
+                if cached_data is None:
+                    cached_data = cls.fetch_data_for_cache(url, fetch or cls.fetch_data)
+                    cache.set(cache_key, cached_data, timeout=cls.get_metadata_cache_timeout(cached_data))
+            finally:
+                if acquired:
+                    cls.release_lock(lock)
+        return cls.unpack_cached_data(cached_data)
+
+    @classmethod
+    async def aget_data(cls, url: str) -> [str]:
+        """get_data for async views, the page is fetched without blocking the event loop"""
+        cache_key = cls.get_metadata_cache_key(url)
+        cached_data = await async_cache.get(cache_key)
+        if cached_data is None:
+            lock = async_cache.lock(f"{cache_key}_lock", timeout=cls.get_fetch_lock_timeout())
+            acquired = await lock.acquire(blocking_timeout=settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS)
+            try:
+                cached_data = await async_cache.get(cache_key) if acquired else None
+                if cached_data is None:
+                    cached_data = await cls.afetch_data_for_cache(url)
+                    await async_cache.set(cache_key, cached_data, timeout=cls.get_metadata_cache_timeout(cached_data))
+            finally:
+                if acquired:
+                    await cls.arelease_lock(lock)
+        return cls.unpack_cached_data(cached_data)
+
+    @classmethod
+    def get_fetch_lock_timeout(cls) -> float:
+        """Worst case of fetching a page: every try times out and is followed by the longest backoff"""
+        retries = settings.BOOKMARK_HTTP_RETRIES
+        return (settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS * (retries + 1)
+                + settings.BOOKMARK_HTTP_MAX_BACKOFF_SECONDS * retries)
+
+    @classmethod
+    def get_metadata_cache_timeout(cls, cached_data: dict) -> int:
+        if "error" in cached_data:
+            return settings.BOOKMARK_METADATA_NEGATIVE_CACHE_SECONDS
+        return settings.BOOKMARK_METADATA_CACHE_SECONDS
+
+    @classmethod
+    def unpack_cached_data(cls, cached_data: dict) -> [str]:
+        if cached_data.get("error") == "not_found":
             raise NotFound()
+        if cached_data.get("error") == "parse_error":
+            raise ParseError()
+        return cached_data["data"]
+
+    @classmethod
+    def get_metadata_cache_key(cls, url: str) -> str:
+        return f"bookmark_metadata_{get_url_hash(url)}"
+
+    @classmethod
+    def fetch_data_for_cache(cls, url: str, fetch: Callable[[str], tuple]) -> dict:
+        try:
+            return {"data": fetch(url)}
+        except NotFound:
+            return {"error": "not_found"}
+        except ParseError:
+            return {"error": "parse_error"}
+
+    @classmethod
+    async def afetch_data_for_cache(cls, url: str) -> dict:
+        try:
+            return {"data": await cls.afetch_data(url)}
+        except NotFound:
+            return {"error": "not_found"}
+        except ParseError:
+            return {"error": "parse_error"}
+
+    @staticmethod
+    def release_lock(lock: Lock) -> None:
+        try:
+            lock.release()
+        except LockError:
+            # lock has expired and may be held by another process already
+            pass
+
+    @staticmethod
+    async def arelease_lock(lock: AsyncLock) -> None:
         try:
-            raw_data = BeautifulSoup(response.content, "html.parser")
-            page_title = raw_data.find("meta", property="og:title")["content"]
-            description = raw_data.find("meta", property="og:description")["content"]
-            image_url = raw_data.find("meta", property="og:image")["content"]
-            page_url = raw_data.find("meta", property="og:url")["content"]
-            page_type = raw_data.find("meta", property="og:type")["content"]
+            await lock.release()
+        except LockError:
+            pass
 
-            # checking page type
-            checked_page_type = cls.check_page_type(page_type=page_type)
+    @classmethod
+    def fetch_data(cls, url: str) -> [str]:
+        """For parsing HTML and extracting content-meta tags. """
+        data, response, content_hash = cls.fetch_page(url)
+        FetchStateService.record(url=data[3], response=response, content_hash=content_hash)
+        return data
+
+    @classmethod
+    def fetch_page(cls, url: str) -> Tuple[tuple, Response, str]:
+        """Metadata of the page with the response and hash of its <head>, for FetchStateService. Doesn't touch db"""
+        response = cls.request_data(url=url, stream=True)
+        metadata = cls.read_metadata(response)
+        return cls.parse_metadata(metadata), response, metadata.content_hash
+
+    @classmethod
+    async def afetch_data(cls, url: str) -> [str]:
+        response = await get_async_http_client().request("GET", url, stream=True)
+        metadata = await cls.aread_metadata(response)
+        data = cls.parse_metadata(metadata)
+        await FetchStateService.arecord(url=data[3], response=response, content_hash=metadata.content_hash)
+        return data
+
+    @classmethod
+    def read_metadata(cls, response: Response) -> HeadMetaParser:
+        """Read response body only until the end of <head>"""
+        try:
+            if response.status_code == 404:
+                raise NotFound()
+            return extract_head_metadata(
+                response.iter_content(chunk_size=cls.CHUNK_SIZE),
+                encoding=get_charset(response.headers.get("Content-Type"), default=None),
+                max_bytes=settings.BOOKMARK_HEAD_MAX_BYTES,
+            )
+        finally:
+            response.close()
+
+    @classmethod
+    async def aread_metadata(cls, response: httpx.Response) -> HeadMetaParser:
+        try:
+            if response.status_code == 404:
+                raise NotFound()
+            return await aextract_head_metadata(
+                response.aiter_bytes(chunk_size=cls.CHUNK_SIZE),
+                encoding=get_charset(response.headers.get("Content-Type"), default=None),
+                max_bytes=settings.BOOKMARK_HEAD_MAX_BYTES,
+            )
+        finally:
+            await response.aclose()
 
-        except Exception as e:
+    @classmethod
+    def parse_metadata(cls, metadata: HeadMetaParser) -> [str]:
+        page_title = metadata.get("og:title", "twitter:title") or metadata.title
+        description = metadata.get("og:description", "twitter:description")
+        image_url = metadata.get("og:image", "twitter:image")
+        page_url = metadata.get("og:url")
+        page_type = metadata.get("og:type")
+        if None in (page_title, description, image_url, page_url, page_type):
             raise ParseError()
+
+        # checking page type
+        checked_page_type = cls.check_page_type(page_type=page_type)
         return page_title, description, image_url, page_url, checked_page_type
 
     @classmethod
-    def request_data(cls, url: str) -> Response:
+    def request_data(cls, url: str, timeout: Optional[float] = None, method: str = "GET", **kwargs) -> Response:
         """Request Data from given URL"""
-        return requests.get(url=url)
+        if timeout is None:
+            timeout = settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS
+        return get_http_client().request(method, url, timeout=timeout, **kwargs)
 
     @classmethod
     def check_page_type(cls, page_type: str) -> str:
@@ -53,21 +283,493 @@ class BookmarkService:
         return Bookmark.PageTypeEnum.WEBSITE.value
 
 
+class BookmarkImportService:
+    @classmethod
+    def import_bookmarks(cls, urls: List[str], user: User) -> List[dict]:
+        """
+        Fetch metadata of all urls concurrently and save bookmarks with bulk_create.
+        Returns result for every url: id of created bookmark or error message.
+        """
+        with ThreadPoolExecutor(max_workers=settings.BOOKMARK_IMPORT_CONCURRENCY) as executor:
+            fetched = list(executor.map(cls.fetch_data, urls))
+        FetchStateService.record_many([page for _, _, pages in fetched for page in pages])
+
+        bookmarks, results = [], []
+        for url, (data, error, _) in zip(urls, fetched):
+            bookmark = None
+            if error is None:
+                bookmark, error = cls.build_bookmark(data, user)
+            if error is not None:
+                results.append({"url": url, "error": error})
+                continue
+            bookmarks.append(bookmark)
+            results.append({"url": url, "bookmark": bookmark})
+        cls.bulk_create(bookmarks, user)
+        return [cls.format_result(result) for result in results]
+
+    @classmethod
+    def build_bookmark(cls, data: tuple, user: User) -> Tuple[Optional[Bookmark], Optional[str]]:
+        """Bookmark of fetched metadata fitted into its columns, so that one page can't fail bulk_create of the import"""
+        data, error = BookmarkService.fit_data(data)
+        if error is not None:
+            return None, error
+        page_title, description, image_url, page_url, page_type = data
+        bookmark = Bookmark(page_title=page_title, description=description, image_url=image_url,
+                            page_url=page_url, url_hash=get_url_hash(page_url), domain=get_url_domain(page_url),
+                            page_type=page_type, user=user)
+        return bookmark, None
+
+    @classmethod
+    def import_pending_bookmarks(cls, urls: List[str], user: User) -> List[dict]:
+        """Save bookmarks without metadata, they are filled later by fetch_bookmark_data task"""
+        bookmarks = [Bookmark(page_url=url, url_hash=get_url_hash(url), domain=get_url_domain(url),
+                              status=Bookmark.StatusEnum.PENDING, user=user) for url in urls]
+        cls.bulk_create(bookmarks, user)
+        return [cls.format_result({"url": url, "bookmark": bookmark}) for url, bookmark in zip(urls, bookmarks)]
+
+    @classmethod
+    def fetch_data(cls, url: str) -> Tuple[Optional[tuple], Optional[str], List[tuple]]:
+        """
+        Metadata from the cache shared with BookmarkService.get_data, or error message.
+        Runs in worker thread, so it must not touch the database: fetched pages are returned
+        as arguments of FetchStateService.record_many.
+        """
+        pages = []
+
+        def fetch_page(page_url: str) -> tuple:
+            data, response, content_hash = BookmarkService.fetch_page(page_url)
+            pages.append((data[3], response, content_hash))
+            return data
+
+        try:
+            return BookmarkService.get_data(url, fetch=fetch_page), None, pages
+        except APIException as e:
+            return None, str(e.detail), pages
+        except requests.RequestException as e:
+            logger.warning("Failed to import %s: %s", url, e)
+            return None, "Failed to fetch page.", pages
+
+    @classmethod
+    def bulk_create(cls, bookmarks: List[Bookmark], user: User) -> None:
+        """All batches are saved or none of them"""
+        with transaction.atomic():
+            Bookmark.objects.bulk_create(bookmarks, batch_size=settings.BOOKMARK_IMPORT_BATCH_SIZE)
+            # bulk_create doesn't send post_save, so the cache is cleared here
+            transaction.on_commit(lambda: bump_list_version(user.id))
+
+    @classmethod
+    def format_result(cls, result: dict) -> dict:
+        if "bookmark" not in result:
+            return result
+        bookmark = result["bookmark"]
+        return {"url": result["url"], "id": bookmark.id, "status": bookmark.status}
+
+
+class FetchStateService:
+    UPDATE_FIELDS = ("etag", "last_modified", "last_status", "last_checked_at", "content_hash", "next_check_at",
+                     "check_interval", "failure_count", "dead_since")
+    DEAD_STATUS_CODES = (404, 410)
+
+    @classmethod
+    def get_conditional_headers(cls, state: Optional[FetchState]) -> dict:
+        headers = {}
+        if state is not None and state.etag:
+            headers["If-None-Match"] = state.etag
+        if state is not None and state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+        return headers
+
+    @classmethod
+    def apply_response(cls, state: FetchState, response: Response, content_hash: Optional[str] = None) -> FetchState:
+        """
+        Remember validators of the response. 304 means that stored validators are still valid.
+        Url is dead since its first "not found" response, until any successful one.
+        """
+        if response.status_code in cls.DEAD_STATUS_CODES:
+            state.dead_since = state.dead_since or timezone.now()
+        elif response.status_code < 400:
+            state.dead_since = None
+        if response.status_code != 304:
+            state.etag = cls.get_validator(response, "ETag", FetchState._meta.get_field("etag").max_length)
+            state.last_modified = cls.get_validator(response, "Last-Modified",
+                                                    FetchState._meta.get_field("last_modified").max_length)
+        if content_hash is not None:
+            state.content_hash = content_hash
+        state.last_status = response.status_code
+        state.last_checked_at = timezone.now()
+        return state
+
+    @classmethod
+    def get_validator(cls, response: Response, header: str, max_length: int) -> Optional[str]:
+        value = response.headers.get(header)
+        if value and len(value) <= max_length:
+            return value
+        return None
+
+    @classmethod
+    def schedule(cls, state: FetchState, is_healthy: bool) -> FetchState:
+        """
+        Interval between checks grows exponentially while url stays healthy and shrinks after every failure,
+        staying within BOOKMARK_CHECK_MIN_INTERVAL_SECONDS and BOOKMARK_CHECK_MAX_INTERVAL_SECONDS.
+        """
+        min_interval = settings.BOOKMARK_CHECK_MIN_INTERVAL_SECONDS
+        interval = state.check_interval or min_interval
+        if is_healthy:
+            state.failure_count = 0
+            interval = interval * settings.BOOKMARK_CHECK_BACKOFF if state.check_interval else interval
+        else:
+            state.failure_count += 1
+            interval = interval / settings.BOOKMARK_CHECK_BACKOFF
+        state.check_interval = int(min(max(interval, min_interval), settings.BOOKMARK_CHECK_MAX_INTERVAL_SECONDS))
+        # jitter spreads urls saved at the same time over different ticks
+        state.next_check_at = timezone.now() + timedelta(seconds=state.check_interval * random.uniform(0.9, 1.1))
+        return state
+
+    @classmethod
+    def record(cls, url: str, response: Response, content_hash: Optional[str] = None) -> Optional[FetchState]:
+        """State of fetched page, urls longer than FetchState.url aren't tracked"""
+        url = canonicalize_url(url)
+        if len(url) > FetchState._meta.get_field("url").max_length:
+            return None
+        state, _ = FetchState.objects.get_or_create(url=url)
+        cls.apply_response(state, response, content_hash=content_hash)
+        cls.schedule(state, is_healthy=True)
+        state.save(update_fields=cls.UPDATE_FIELDS)
+        return state
+
+    @classmethod
+    def record_many(cls, pages: List[Tuple[str, Response, Optional[str]]]) -> None:
+        """record for many fetched pages with a few queries, pages are (url, response, content_hash)"""
+        if not pages:
+            return
+        max_length = FetchState._meta.get_field("url").max_length
+        pages = {canonicalize_url(url): (response, content_hash) for url, response, content_hash in pages}
+        pages = {url: page for url, page in pages.items() if len(url) <= max_length}
+        FetchState.objects.bulk_create([FetchState(url=url) for url in pages], ignore_conflicts=True)
+        states = FetchState.objects.in_bulk(list(pages), field_name="url")
+        for url, (response, content_hash) in pages.items():
+            cls.apply_response(states[url], response, content_hash=content_hash)
+            cls.schedule(states[url], is_healthy=True)
+        FetchState.objects.bulk_update(states.values(), fields=cls.UPDATE_FIELDS)
+
+    @classmethod
+    async def arecord(cls, url: str, response: httpx.Response,
+                      content_hash: Optional[str] = None) -> Optional[FetchState]:
+        url = canonicalize_url(url)
+        if len(url) > FetchState._meta.get_field("url").max_length:
+            return None
+        state, _ = await FetchState.objects.aget_or_create(url=url)
+        cls.apply_response(state, response, content_hash=content_hash)
+        cls.schedule(state, is_healthy=True)
+        await state.asave(update_fields=cls.UPDATE_FIELDS)
+        return state
+
+
 class UpdateUserBookmarksService:
 
     @classmethod
-    def get_all_bookmarks(cls) -> List[Bookmark]:
-        return Bookmark.objects.all()
+    def get_due_states(cls, limit: Optional[int] = None) -> List[FetchState]:
+        has_bookmarks = Exists(Bookmark.objects.filter(fetch_state=OuterRef("pk")))
+        return list(
+            FetchState.objects.filter(next_check_at__lte=timezone.now())
+            .annotate(has_bookmarks=has_bookmarks)
+            .order_by("next_check_at")[:limit or settings.BOOKMARK_SWEEP_BATCH_SIZE]
+        )
+
+    @classmethod
+    def collect_due_states(cls, limit: Optional[int] = None) -> List[FetchState]:
+        """Due urls which have bookmarks, states of urls without them are deleted"""
+        cls.link_bookmarks()
+        states = cls.get_due_states(limit)
+        orphan_ids = [state.id for state in states if not state.has_bookmarks]
+        if orphan_ids:
+            FetchState.objects.filter(id__in=orphan_ids).delete()
+        return [state for state in states if state.has_bookmarks]
+
+    @classmethod
+    def check_states(cls, states: List[FetchState]) -> dict:
+        """Check urls and update status of their bookmarks, returns counts of urls and bookmarks"""
+        with ThreadPoolExecutor(max_workers=min(settings.BOOKMARK_SWEEP_CONCURRENCY, len(states))) as executor:
+            responses = list(executor.map(cls.check_url, [state.url for state in states], states))
+
+        dead_ids, alive_ids = [], []
+        for state, response in zip(states, responses):
+            if response is not None:
+                FetchStateService.apply_response(state, response)
+            is_healthy = response is not None and response.status_code < 400
+            FetchStateService.schedule(state, is_healthy=is_healthy)
+            if state.dead_since is not None:
+                dead_ids.append(state.id)
+            elif is_healthy:
+                alive_ids.append(state.id)
+
+        with transaction.atomic():
+            FetchState.objects.bulk_update(states, fields=FetchStateService.UPDATE_FIELDS)
+            dead = cls.set_bookmarks_status(dead_ids, Bookmark.StatusEnum.READY, Bookmark.StatusEnum.DEAD)
+            revived = cls.set_bookmarks_status(alive_ids, Bookmark.StatusEnum.DEAD, Bookmark.StatusEnum.READY)
+        return {"checked": len(states), "dead": dead, "revived": revived}
+
+    @classmethod
+    def set_bookmarks_status(cls, state_ids: List[int], from_status: str, to_status: str) -> int:
+        """
+        Change status of bookmarks of given urls with an UPDATE per BOOKMARK_SWEEP_CHUNK_SIZE urls.
+        Updates don't send model signals, so lists of affected users are invalidated at once after commit.
+        """
+        count, user_ids = 0, set()
+        chunk_size = settings.BOOKMARK_SWEEP_CHUNK_SIZE
+        for start in range(0, len(state_ids), chunk_size):
+            bookmarks = Bookmark.objects.filter(fetch_state_id__in=state_ids[start:start + chunk_size],
+                                                status=from_status)
+            user_ids.update(bookmarks.order_by().values_list("user_id", flat=True).distinct())
+            count += bookmarks.update(status=to_status, updated_at=timezone.now())
+        if user_ids:
+            transaction.on_commit(lambda: bump_list_versions(user_ids))
+        return count
+
+    @classmethod
+    def purge_dead_bookmarks(cls) -> int:
+        """Delete bookmarks whose url has been dead for BOOKMARK_DEAD_PURGE_SECONDS, together with the url"""
+        if not settings.BOOKMARK_DEAD_PURGE_SECONDS:
+            return 0
+        dead_before = timezone.now() - timedelta(seconds=settings.BOOKMARK_DEAD_PURGE_SECONDS)
+        state_ids = list(FetchState.objects.filter(dead_since__lte=dead_before)
+                         .values_list("id", flat=True)[:settings.BOOKMARK_SWEEP_BATCH_SIZE])
+        count, chunk_size = 0, settings.BOOKMARK_SWEEP_CHUNK_SIZE
+        with batch_list_invalidation(), transaction.atomic():
+            for start in range(0, len(state_ids), chunk_size):
+                _, deleted = Bookmark.objects.filter(fetch_state_id__in=state_ids[start:start + chunk_size],
+                                                     status=Bookmark.StatusEnum.DEAD).delete()
+                count += deleted.get(Bookmark._meta.label, 0)
+            # bookmarks of other statuses are linked to a new state and checked again
+            FetchState.objects.filter(id__in=state_ids).delete()
+        return count
 
     @classmethod
-    def update_all_bookmarks(cls) -> None:
-        """Check for validness of page_url, if url doesn't exist anymore than it will be deleted"""
-        bookmarks = cls.get_all_bookmarks()
-        count = 0
+    def link_bookmarks(cls) -> int:
+        """Attach new bookmarks to the FetchState of their normalized url, so that scheduler starts checking them"""
+        bookmarks = list(
+            Bookmark.objects.filter(fetch_state__isnull=True)
+            .order_by()
+            .only("id", "page_url")[:settings.BOOKMARK_SWEEP_BATCH_SIZE]
+        )
+        if not bookmarks:
+            return 0
+        urls = {bookmark.id: canonicalize_url(bookmark.page_url) for bookmark in bookmarks}
+        FetchState.objects.bulk_create([FetchState(url=url) for url in set(urls.values())], ignore_conflicts=True)
+        states = FetchState.objects.in_bulk(set(urls.values()), field_name="url")
         for bookmark in bookmarks:
-            response = BookmarkService.request_data(bookmark.page_url)
-            if response.status_code == 404:
-                bookmark.delete()
-                count += 1
+            bookmark.fetch_state = states[urls[bookmark.id]]
+        Bookmark.objects.bulk_update(bookmarks, fields=("fetch_state",))
+        return len(bookmarks)
+
+    @classmethod
+    def check_url(cls, url: str, state: Optional[FetchState] = None) -> Optional[Response]:
+        """
+        Check url without downloading the page: HEAD request with stored validators, or conditional GET
+        with unread body if server doesn't allow HEAD. Network errors and timeouts return None, such check
+        is counted as a failure.
+        """
+        headers = FetchStateService.get_conditional_headers(state)
+        try:
+            response = BookmarkService.request_data(url, method="HEAD", headers=headers)
+            if response.status_code in (405, 501):
+                response = BookmarkService.request_data(url, headers=headers, stream=True)
+                response.close()
+        except requests.RequestException as e:
+            logger.warning("Failed to check %s: %s", url, e)
+            return None
+        return response
+
+
+class BookmarkSweepService:
+    """
+    Sweep split between huey workers. Coordinator takes the sweep lock and partitions due urls into
+    BOOKMARK_SWEEP_SHARDS shards, each of them is checked by its own task. Shards count their results in Redis,
+    the last one purges dead bookmarks, logs summary of the sweep and releases the lock.
+    """
+    LOCK_KEY = "bookmark_sweep_lock"
+    COUNTERS = ("checked", "dead", "revived", "failed")
+
+    @classmethod
+    def start(cls) -> Optional[Tuple[str, List[List[int]]]]:
+        """Id of the new sweep and ids of states in its shards, None if previous sweep is still running"""
+        sweep_id = uuid.uuid4().hex
+        lock = cache.lock(cls.LOCK_KEY, timeout=settings.BOOKMARK_SWEEP_LOCK_SECONDS)
+        if not lock.acquire(blocking=False, token=sweep_id):
+            logger.info("Previous sweep is still running")
+            return None
+        try:
+            shards_count = settings.BOOKMARK_SWEEP_SHARDS
+            states = UpdateUserBookmarksService.collect_due_states(settings.BOOKMARK_SWEEP_BATCH_SIZE * shards_count)
+            shards = cls.partition(states, shards_count)
+            if not shards:
+                UpdateUserBookmarksService.purge_dead_bookmarks()
+                cls.release(sweep_id)
+                return None
+            progress_key = cls.get_progress_key(sweep_id)
+            with get_redis_connection("default").pipeline() as pipeline:
+                pipeline.hset(progress_key, mapping={"shards": len(shards), "started_at": time.time(),
+                                                     **dict.fromkeys(cls.COUNTERS, 0)})
+                pipeline.expire(progress_key, settings.BOOKMARK_SWEEP_LOCK_SECONDS)
+                pipeline.execute()
+        except Exception:
+            cls.release(sweep_id)
+            raise
+        logger.info("Sweep %s: %s urls in %s shards", sweep_id, len(states), len(shards))
+        return sweep_id, shards
+
+    @classmethod
+    def partition(cls, states: List[FetchState], shards_count: int) -> List[List[int]]:
+        """Urls of a host stay in one shard, so rate limit of the host holds within the worker checking it"""
+        shards = [[] for _ in range(shards_count)]
+        for state in states:
+            host_hash = hashlib.md5((get_url_domain(state.url) or "").encode()).digest()
+            shards[int.from_bytes(host_hash[:8], "big") % shards_count].append(state.id)
+        return [shard for shard in shards if shard]
+
+    @classmethod
+    def run_shard(cls, sweep_id: str, state_ids: List[int]) -> None:
+        summary = dict.fromkeys(cls.COUNTERS, 0)
+        try:
+            states = list(FetchState.objects.filter(id__in=state_ids))
+            if states:
+                summary.update(UpdateUserBookmarksService.check_states(states))
+        except Exception:
+            summary["failed"] = 1
+            raise
+        finally:
+            cls.finish_shard(sweep_id, summary)
+
+    @classmethod
+    def finish_shard(cls, sweep_id: str, summary: dict) -> None:
+        progress_key = cls.get_progress_key(sweep_id)
+        redis = get_redis_connection("default")
+        with redis.pipeline() as pipeline:
+            for counter, value in summary.items():
+                pipeline.hincrby(progress_key, counter, value)
+            pipeline.hincrby(progress_key, "shards", -1)
+            pipeline.hgetall(progress_key)
+            *_, shards_left, progress = pipeline.execute()
+        logger.info("Sweep %s: shard of %s urls is done, %s shards left", sweep_id, summary["checked"], shards_left)
+        if shards_left != 0:
+            return
+
+        progress = {field.decode(): float(value) for field, value in progress.items()}
+        purged = UpdateUserBookmarksService.purge_dead_bookmarks()
+        logger.info("Sweep %s is done in %.1fs: %d urls checked, %d bookmarks marked dead, %d revived, %d deleted, "
+                    "%d shards failed", sweep_id, time.time() - progress["started_at"], progress["checked"],
+                    progress["dead"], progress["revived"], purged, progress["failed"])
+        redis.delete(progress_key)
+        cls.release(sweep_id)
+
+    @classmethod
+    def release(cls, sweep_id: str) -> None:
+        """Lock is released by the last shard, which may run in another process than the coordinator"""
+        try:
+            cache.lock(cls.LOCK_KEY).do_release(sweep_id)
+        except LockError:
+            # sweep took longer than BOOKMARK_SWEEP_LOCK_SECONDS, the next one could have started already
+            pass
+
+    @classmethod
+    def get_progress_key(cls, sweep_id: str) -> str:
+        return cache.make_key(f"bookmark_sweep_{sweep_id}")
+
+
+class BookmarkFilterService:
+    @classmethod
+    def filter(cls, bookmarks: QuerySet, filters: dict) -> QuerySet:
+        """
+        Filters validated by BookmarkFilterSerializer, each of them is backed by index on user.
+        Dead bookmarks are listed only when they are requested by status.
+        """
+        if "status" in filters:
+            bookmarks = bookmarks.filter(status=filters["status"])
+        else:
+            bookmarks = bookmarks.exclude(status=Bookmark.StatusEnum.DEAD)
+        if "page_type" in filters:
+            bookmarks = bookmarks.filter(page_type=filters["page_type"])
+        if "domain" in filters:
+            bookmarks = bookmarks.filter(domain=filters["domain"])
+        if "created_after" in filters:
+            bookmarks = bookmarks.filter(created_at__gte=filters["created_after"])
+        if "created_before" in filters:
+            bookmarks = bookmarks.filter(created_at__lt=filters["created_before"])
+        return bookmarks
+
+    @classmethod
+    def get_facets(cls, bookmarks: QuerySet) -> dict:
+        """Counts per page_type and per domain, both are summed up from one query grouped by the pair"""
+        page_types, domains = Counter(), Counter()
+        for row in bookmarks.order_by().values("page_type", "domain").annotate(count=Count("id")):
+            page_types[row["page_type"]] += row["count"]
+            if row["domain"]:
+                domains[row["domain"]] += row["count"]
+        return {
+            "page_type": [{"value": value, "count": count} for value, count in page_types.most_common()],
+            "domain": [{"value": value, "count": count}
+                       for value, count in domains.most_common(settings.BOOKMARK_FACET_DOMAINS)],
+        }
+
+
+class BookmarkSearchService:
+    @classmethod
+    def search(cls, query: str, user: User) -> QuerySet:
+        """Bookmarks of user ranked by relevance, titles weigh more than descriptions"""
+        bookmarks = Bookmark.objects.filter(user=user).exclude(status=Bookmark.StatusEnum.DEAD).defer("search_vector")
+        if connection.vendor != "postgresql":
+            return bookmarks.filter(Q(page_title__icontains=query) | Q(description__icontains=query)).order_by(
+                "-created_at", "-id")
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return bookmarks.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F("search_vector"), search_query)).order_by("-rank", "-created_at", "-id")
+
+
+class BookmarkExportService:
+    content_types = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv",
+    }
+
+    @classmethod
+    def export(cls, bookmarks: QuerySet, fields: Optional[Sequence[str]], export_format: str) -> Iterator[bytes]:
+        """
+        Bookmarks rendered in chunks of BOOKMARK_EXPORT_CHUNK_SIZE rows, which are read from server-side cursor,
+        so memory doesn't grow with number of exported bookmarks
+        """
+        serializer = BookmarkListSerializer(fields=fields)
+        chunk_size = settings.BOOKMARK_EXPORT_CHUNK_SIZE
+        rows = bookmarks.order_by("-created_at", "-id").values(*serializer.columns).iterator(chunk_size=chunk_size)
+        chunks = iter(lambda: serializer.to_representation(islice(rows, chunk_size)), [])
+        if export_format == "csv":
+            return cls.render_csv(chunks, columns=list(serializer.formatters))
+        return cls.render_ndjson(chunks)
+
+    @staticmethod
+    def render_ndjson(chunks: Iterable[List[dict]]) -> Iterator[bytes]:
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        for chunk in chunks:
+            yield "".join(f"{encoder.encode(item)}\n" for item in chunk).encode()
+
+    @staticmethod
+    def render_csv(chunks: Iterable[List[dict]], columns: List[str]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():  # header of empty export
+            yield buffer.getvalue().encode()
 
-        print(f"{count} закладок было удалено")
+    @staticmethod
+    def compress(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Gzip stream compressed on the fly, wbits=31 writes gzip header and trailer around deflate data"""
+        compressor = zlib.compressobj(wbits=31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -1,10 +1,29 @@
+from typing import List
+
 from huey import crontab
-from huey.contrib.djhuey import db_periodic_task
+from huey.contrib.djhuey import db_periodic_task, db_task
 
-from bookmarks.services import UpdateUserBookmarksService
+from bookmarks.services import BookmarkService, BookmarkSweepService
 
 
 @db_periodic_task(crontab(minute="*"))
 def update_bookmark_data() -> None:
-    """Task for checking bookmarks existence"""
-    UpdateUserBookmarksService.update_all_bookmarks()
+    """Coordinator of checking existence of bookmarks which are due for a check, shards are checked in parallel"""
+    sweep = BookmarkSweepService.start()
+    if sweep is None:
+        return
+    sweep_id, shards = sweep
+    for state_ids in shards:
+        check_bookmark_shard(sweep_id, state_ids)
+
+
+@db_task()
+def check_bookmark_shard(sweep_id: str, state_ids: List[int]) -> None:
+    """Task for checking urls of one shard of the sweep"""
+    BookmarkSweepService.run_shard(sweep_id, state_ids)
+
+
+@db_task()
+def fetch_bookmark_data(bookmark_id: int) -> None:
+    """Task for filling metadata of bookmark created in async mode"""
+    BookmarkService.fill_bookmark(bookmark_id)
@@ -0,0 +1,120 @@
+from unittest.mock import patch
+
+import httpx
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from bookmarks.client import AsyncHttpClient
+from bookmarks.models import Bookmark, FetchState
+from bookmarks.services import BookmarkService
+from bookmarks.tests.factories import BookmarkFactory
+from users.tests.factories import UserFactory
+
+PAGE = """<html><head>
+    <meta property="og:title" content="Title">
+    <meta property="og:description" content="Description">
+    <meta property="og:image" content="https://example.com/image.png">
+    <meta property="og:url" content="https://example.com/async">
+    <meta property="og:type" content="article">
+</head><body></body></html>"""
+
+
+@pytest.fixture
+def authorized_client(api_client: APIClient, user: UserFactory) -> APIClient:
+    access_token, _ = Token.objects.get_or_create(user=user)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+    return api_client
+
+
+@pytest.fixture
+def page_requests():
+    """Urls requested by async http client, every page responds with PAGE"""
+    requested = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, headers={"ETag": '"v1"'}, content=PAGE.encode())
+
+    def get_client() -> AsyncHttpClient:
+        return AsyncHttpClient(rate_limit=1000, burst=1000, max_connections=10, retries=0, backoff_factor=0,
+                               max_backoff=0, transport=httpx.MockTransport(handle))
+
+    with patch("bookmarks.services.get_async_http_client", get_client):
+        yield requested
+
+
+@pytest.mark.django_db
+class TestBookmarkListCreateAsync:
+    url = reverse("async-bookmark-create")
+
+    def test_throw_error_if_access_token_invalid(self, api_client: APIClient) -> None:
+        api_client.credentials(HTTP_AUTHORIZATION="Token NotValidAccessToken")
+
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.json() == {"detail": "Invalid token."}
+
+    def test_returns_same_list_as_sync_view(self, authorized_client: APIClient,
+                                            bookmarks: [BookmarkFactory]) -> None:
+        params = {"page_size": 2, "fields": "id,page_title"}
+
+        response = authorized_client.get(self.url, params)
+
+        assert response.status_code == status.HTTP_200_OK
+        sync_response = authorized_client.get(reverse("bookmark-create"), params).json()
+        assert response.json()["results"] == sync_response["results"]
+        assert authorized_client.get(response.json()["next"]).json()["results"] == [
+            {"id": bookmark.id, "page_title": bookmark.page_title} for bookmark in bookmarks[2:4]]
+
+    def test_creates_bookmark(self, authorized_client: APIClient, user: UserFactory, page_requests: list) -> None:
+        url = "https://example.com/async?utm_source=test"
+        cache.delete(BookmarkService.get_metadata_cache_key(url))
+
+        response = authorized_client.post(self.url, data={"url": url})
+        authorized_client.post(self.url, data={"url": url})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        bookmark = Bookmark.objects.filter(user=user).order_by("id").first()
+        assert response.json()["id"] == bookmark.id
+        assert (bookmark.page_title, bookmark.page_url, bookmark.page_type) == (
+            "Title", "https://example.com/async", "article")
+        assert page_requests == [url]  # second bookmark of the page came from metadata cache
+        assert FetchState.objects.get(url="https://example.com/async").etag == '"v1"'
+
+    def test_requires_valid_url(self, authorized_client: APIClient) -> None:
+        response = authorized_client.post(self.url, data={"url": "It's not URL"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"url": ["Enter a valid URL."]}
+
+
+@pytest.mark.django_db
+class TestBookmarkAsync:
+    def get_url(self, bookmark_id: int = 12345) -> str:
+        return reverse("async-bookmark", args=[bookmark_id])
+
+    def test_retrieve_bookmark(self, authorized_client: APIClient, bookmark: BookmarkFactory) -> None:
+        response = authorized_client.get(self.get_url(bookmark.id))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == authorized_client.get(reverse("bookmark", args=[bookmark.id])).json()
+
+    def test_return_404_for_bookmark_of_other_user(self, authorized_client: APIClient) -> None:
+        bookmark = BookmarkFactory()
+
+        response = authorized_client.get(self.get_url(bookmark.id))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_change_and_delete_bookmark(self, authorized_client: APIClient, bookmark: BookmarkFactory) -> None:
+        response = authorized_client.patch(self.get_url(bookmark.id), data={"description": "Changed"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["description"] == "Changed"
+        assert authorized_client.delete(self.get_url(bookmark.id)).status_code == status.HTTP_204_NO_CONTENT
+        assert not Bookmark.objects.filter(id=bookmark.id).exists()
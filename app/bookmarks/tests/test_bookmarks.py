@@ -1,10 +1,40 @@
+import csv
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
 import pytest
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DataError, connection
+from django.db.models import QuerySet
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
+from bookmarks.cache import BookmarkListCache, batch_list_invalidation, bump_list_version, get_list_version
+from bookmarks.models import Bookmark, FetchState
+from bookmarks.serializers import BookmarkListSerializer, BookmarkSerializer
+from bookmarks.services import (
+    BookmarkSearchService,
+    BookmarkImportService,
+    BookmarkService,
+    BookmarkSweepService,
+    FetchStateService,
+    UpdateUserBookmarksService,
+)
 from bookmarks.tests.factories import BookmarkFactory
+from bookmarks.utils import canonicalize_url, get_url_domain, get_url_hash
 from users.tests.factories import UserFactory
 
 
@@ -65,7 +95,7 @@ class TestBookmarkCreate:
         response = api_client.get(self.url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.json() == [{
+        assert response.json()["results"] == [{
             "id": bookmark.id,
             "created_at": bookmark.created_at.isoformat()[:-6] + 'Z',
             "updated_at": bookmark.updated_at.isoformat()[:-6] + 'Z',
@@ -74,9 +104,217 @@ class TestBookmarkCreate:
             "page_url": bookmark.page_url,
             "page_type": bookmark.page_type.value,
             "image_url": bookmark.image_url,
+            "status": bookmark.status,
             "user": user.id
         } for bookmark in bookmarks]
 
+    def test_paginates_list_bookmarks(self, api_client: APIClient, user: UserFactory,
+                                      bookmarks: [BookmarkFactory]) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+
+        ids, url = [], f"{self.url}?page_size=2"
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.json()["results"]) <= 2
+            ids += [bookmark["id"] for bookmark in response.json()["results"]]
+            url = response.json()["next"]
+
+        assert ids == [bookmark.id for bookmark in bookmarks]
+
+    def test_list_cache_is_cleared_on_change(self, api_client: APIClient, user: UserFactory,
+                                             bookmarks: [BookmarkFactory]) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        api_client.get(self.url)
+        bookmarks[0].delete()
+
+        response = api_client.get(self.url)
+
+        assert [bookmark["id"] for bookmark in response.json()["results"]] == [
+            bookmark.id for bookmark in bookmarks[1:]]
+
+    def test_returns_requested_fields(self, api_client: APIClient, user: UserFactory,
+                                      bookmarks: [BookmarkFactory]) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(self.url, {"fields": "id,page_title,image_url", "page_size": 2})
+
+        assert [set(item) for item in response.json()["results"]] == [{"id", "page_title", "image_url"}] * 2
+        assert not any("description" in query["sql"] for query in queries)
+        next_page = api_client.get(response.json()["next"])
+        assert [set(item) for item in next_page.json()["results"]] == [{"id", "page_title", "image_url"}] * 2
+
+    def test_filters_list(self, api_client: APIClient, user: UserFactory) -> None:
+        now = timezone.now()
+        article = BookmarkFactory(user=user, page_url="https://www.example.com/a", page_type="article")
+        BookmarkFactory(user=user, page_url="https://example.com/b", page_type="video")
+        BookmarkFactory(user=user, page_url="https://other.com/a", page_type="article")
+        Bookmark.objects.filter(id=article.id).update(created_at=now - timedelta(days=2))
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+
+        def get_urls(**params) -> list:
+            response = api_client.get(self.url, params)
+            assert response.status_code == status.HTTP_200_OK
+            return [item["page_url"] for item in response.json()["results"]]
+
+        assert get_urls(domain="WWW.example.com") == ["https://example.com/b", "https://www.example.com/a"]
+        assert get_urls(domain="example.com", page_type="article") == ["https://www.example.com/a"]
+        assert get_urls(created_before=(now - timedelta(days=1)).isoformat()) == ["https://www.example.com/a"]
+        assert get_urls(created_after=(now - timedelta(days=1)).isoformat(), ordering="created_at") == [
+            "https://example.com/b", "https://other.com/a"]
+
+    def test_hides_dead_bookmarks(self, api_client: APIClient, user: UserFactory,
+                                  bookmarks: [BookmarkFactory]) -> None:
+        Bookmark.objects.filter(id=bookmarks[0].id).update(status=Bookmark.StatusEnum.DEAD)
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+
+        response = api_client.get(self.url)
+        dead_response = api_client.get(self.url, {"status": "dead"})
+
+        assert [item["id"] for item in response.json()["results"]] == [bookmark.id for bookmark in bookmarks[1:]]
+        assert [item["id"] for item in dead_response.json()["results"]] == [bookmarks[0].id]
+
+    def test_requires_valid_filters(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.get(self.url, {"page_type": "podcast", "created_after": "yesterday"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.json()) == {"page_type", "created_after"}
+
+    def test_returns_facets(self, api_client: APIClient, user: UserFactory) -> None:
+        BookmarkFactory(user=user, page_url="https://www.example.com/a", page_type="article")
+        BookmarkFactory(user=user, page_url="https://example.com/b", page_type="video")
+        BookmarkFactory(user=user, page_url="https://other.com/a", page_type="article")
+        BookmarkFactory(page_url="https://example.com/c", page_type="video")
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(reverse("bookmark-facets"))
+
+        assert response.json() == {
+            "page_type": [{"value": "article", "count": 2}, {"value": "video", "count": 1}],
+            "domain": [{"value": "example.com", "count": 2}, {"value": "other.com", "count": 1}],
+        }
+        assert len([query for query in queries if 'FROM "bookmarks_bookmark"' in query["sql"]]) == 1
+        response = api_client.get(reverse("bookmark-facets"), {"page_type": "video"})
+        assert response.json()["domain"] == [{"value": "example.com", "count": 1}]
+
+    def test_returns_not_modified_if_list_didnt_change(self, api_client: APIClient, user: UserFactory,
+                                                        bookmarks: [BookmarkFactory]) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        etag = api_client.get(self.url)["ETag"]
+
+        response = api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+
+        bookmarks[0].delete()
+        response = api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_returns_compressed_list(self, api_client: APIClient, user: UserFactory,
+                                     bookmarks: [BookmarkFactory]) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        assert response["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.content)) == api_client.get(self.url).json()
+
+    def test_tags_each_encoding_with_own_etag(self, api_client: APIClient, user: UserFactory,
+                                              bookmarks: [BookmarkFactory]) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        gzip_etag = api_client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        identity_etag = api_client.get(self.url)["ETag"]
+
+        assert gzip_etag != identity_etag
+        assert api_client.get(self.url, HTTP_IF_NONE_MATCH=gzip_etag).status_code == status.HTTP_200_OK
+        response = api_client.get(self.url, HTTP_IF_NONE_MATCH=gzip_etag, HTTP_ACCEPT_ENCODING="gzip")
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert "Accept-Encoding" in response["Vary"]
+
+    def test_creates_pending_bookmark_in_async_mode(self, api_client: APIClient, user: UserFactory, settings,
+                                                    django_capture_on_commit_callbacks) -> None:
+        settings.BOOKMARK_ASYNC_CREATE = True
+        data = {"url": "https://example.com/article"}
+
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with patch("bookmarks.views.fetch_bookmark_data") as fetch_bookmark_data, \
+                django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(self.url, data=data)
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()["status"] == Bookmark.StatusEnum.PENDING
+        assert response.json()["page_url"] == data["url"]
+        fetch_bookmark_data.assert_called_once_with(response.json()["id"])
+
+
+class TestBookmarkListCache:
+    user_id = 10 ** 9
+    query_params = QueryDict("page_size=2")
+
+    @pytest.fixture(autouse=True)
+    def clear_list_cache(self) -> None:
+        yield
+        cache.delete_pattern(f"cached_bookmarks_{self.user_id}_*")
+
+    def test_write_makes_cached_pages_outdated(self) -> None:
+        BookmarkListCache(self.user_id, self.query_params).get_or_build(lambda: ["old"])
+
+        bump_list_version(self.user_id)
+
+        assert BookmarkListCache(self.user_id, self.query_params).get_or_build(lambda: ["new"]) == ["new"]
+        assert BookmarkListCache(self.user_id, self.query_params).get_or_build(lambda: ["newer"]) == ["new"]
+
+    def test_returns_previous_payload_while_page_is_rebuilt(self) -> None:
+        BookmarkListCache(self.user_id, self.query_params).get_or_build(lambda: ["old"])
+        bump_list_version(self.user_id)
+        list_cache = BookmarkListCache(self.user_id, self.query_params)
+        build = Mock(return_value=["new"])
+
+        cache.add(list_cache.lock_key, 1)
+        assert list_cache.get_or_build(build) == ["old"]
+        build.assert_not_called()
+
+        cache.delete(list_cache.lock_key)
+        assert list_cache.get_or_build(build) == ["new"]
+
+
+@pytest.mark.django_db
+class TestListCacheInvalidation:
+    def test_signal_doesnt_load_user(self, bookmark: BookmarkFactory) -> None:
+        bookmark = Bookmark.objects.get(id=bookmark.id)
+        version = get_list_version(bookmark.user_id)
+
+        with CaptureQueriesContext(connection) as context:
+            bookmark.save()
+            bookmark.delete()
+
+        assert not [query for query in context.captured_queries if "users_user" in query["sql"]]
+        assert get_list_version(bookmark.user_id) == version + 2
+
+    def test_batches_invalidation_of_many_users(self, bookmarks: [BookmarkFactory]) -> None:
+        other_bookmark = BookmarkFactory()
+        user_ids = (bookmarks[0].user_id, other_bookmark.user_id)
+        versions = [get_list_version(user_id) for user_id in user_ids]
+
+        with batch_list_invalidation():
+            Bookmark.objects.all().delete()
+            assert [get_list_version(user_id) for user_id in user_ids] == versions
+
+        assert [get_list_version(user_id) for user_id in user_ids] == [version + 1 for version in versions]
+
 
 @pytest.mark.django_db
 class TestBookmark:
@@ -111,9 +349,29 @@ class TestBookmark:
             "page_url": bookmark.page_url,
             "page_type": bookmark.page_type.value,
             "image_url": bookmark.image_url,
+            "status": bookmark.status,
             "user": user.id
         }
 
+    def test_retrieve_requested_fields(self, api_client: APIClient, user: UserFactory,
+                                       bookmark: BookmarkFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(self.get_url(bookmark.id), {"fields": "image_url,id,page_title"})
+
+        assert response.json() == {"id": bookmark.id, "page_title": bookmark.page_title, "image_url": bookmark.image_url}
+        bookmark_query = next(query["sql"] for query in queries if 'FROM "bookmarks_bookmark"' in query["sql"])
+        assert "description" not in bookmark_query
+
+    def test_requires_known_fields(self, api_client: APIClient, user: UserFactory, bookmark: BookmarkFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.get(self.get_url(bookmark.id), {"fields": "id,password"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "fields" in response.json()
+
     def test_change_bookmark_by_id(self, api_client: APIClient, user: UserFactory, bookmark: BookmarkFactory) -> None:
         data = {
             "description": "Change the description"
@@ -132,6 +390,7 @@ class TestBookmark:
             "page_url": bookmark.page_url,
             "page_type": bookmark.page_type.value,
             "image_url": bookmark.image_url,
+            "status": bookmark.status,
             "user": user.id
         }
 
@@ -141,3 +400,603 @@ class TestBookmark:
         response = api_client.delete(self.get_url(bookmark.id))
 
         assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+@pytest.mark.django_db
+class TestBookmarkSearch:
+    url = reverse("bookmark-search")
+
+    def test_requires_query(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"q": ["This field is required."]}
+
+    def test_returns_ranked_bookmarks_of_user(self, api_client: APIClient, user: UserFactory) -> None:
+        in_description = BookmarkFactory(user=user, page_title="Recipes", description="Python dishes")
+        in_title = BookmarkFactory(user=user, page_title="Python tutorial", description="Learn programming")
+        BookmarkFactory(user=user, page_title="Django", description="Web framework")
+        BookmarkFactory(page_title="Python tutorial")
+
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.get(self.url, {"q": "python"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in response.json()["results"]] == [in_title.id, in_description.id]
+
+    def test_paginates_results(self, api_client: APIClient, user: UserFactory) -> None:
+        BookmarkFactory.create_batch(3, user=user, page_title="Python")
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+
+        first_page = api_client.get(self.url, {"q": "python", "page_size": 2}).json()
+        second_page = api_client.get(first_page["next"]).json()
+
+        assert len(first_page["results"]) == 2 and first_page["previous"] is None
+        assert len(second_page["results"]) == 1 and second_page["next"] is None
+        assert api_client.get(second_page["previous"]).json() == first_page
+
+    def test_updates_search_vector_on_write(self, user: UserFactory) -> None:
+        bookmark = BookmarkFactory(user=user, page_title="Rust", description="")
+        bookmark.page_title = "Golang"
+        bookmark.save()
+
+        assert list(BookmarkSearchService.search("golang", user)) == [bookmark]
+        assert list(BookmarkSearchService.search("rust", user)) == []
+
+
+@pytest.mark.django_db
+class TestBookmarkExport:
+    url = reverse("bookmark-export")
+
+    def get_export(self, api_client: APIClient, user: UserFactory, params: dict) -> bytes:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK and response.streaming
+        return b"".join(response.streaming_content)
+
+    def test_exports_ndjson_in_chunks(self, api_client: APIClient, user: UserFactory, settings) -> None:
+        settings.BOOKMARK_EXPORT_CHUNK_SIZE = 2
+        BookmarkFactory.create_batch(5, user=user)
+        BookmarkFactory()
+        expected = BookmarkSerializer(Bookmark.objects.filter(user=user).order_by("-created_at", "-id"), many=True).data
+
+        content = self.get_export(api_client, user, {})
+
+        assert [json.loads(line) for line in content.decode().splitlines()] == json.loads(json.dumps(expected))
+
+    def test_exports_requested_fields_as_csv(self, api_client: APIClient, user: UserFactory) -> None:
+        article = BookmarkFactory(user=user, page_type="article", page_title='Title, with "quotes"')
+        BookmarkFactory(user=user, page_type="website")
+
+        content = self.get_export(api_client, user, {"export_format": "csv", "fields": "id,page_title",
+                                                     "page_type": "article"})
+
+        assert list(csv.reader(StringIO(content.decode()))) == [["id", "page_title"],
+                                                                 [str(article.id), article.page_title]]
+
+    def test_exports_header_of_empty_csv(self, api_client: APIClient, user: UserFactory) -> None:
+        content = self.get_export(api_client, user, {"export_format": "csv", "fields": "id"})
+
+        assert content == b"id\r\n"
+
+    def test_compresses_export(self, api_client: APIClient, user: UserFactory) -> None:
+        bookmark = BookmarkFactory(user=user)
+
+        content = self.get_export(api_client, user, {"gzip": "true"})
+
+        assert json.loads(gzip.decompress(content))["id"] == bookmark.id
+
+
+@pytest.mark.django_db
+class TestBookmarkListSerializer:
+    def test_renders_same_bytes_as_model_serializer(self, user: UserFactory) -> None:
+        BookmarkFactory.create_batch(3, user=user)
+        BookmarkFactory(user=user, page_title="Заголовок", description=None, image_url=None)
+        queryset = Bookmark.objects.filter(user=user).order_by("-created_at", "-id")
+        serializer = BookmarkListSerializer()
+
+        expected = JSONRenderer().render(BookmarkSerializer(queryset, many=True).data)
+        assert JSONRenderer().render(serializer.to_representation(queryset.values(*serializer.columns))) == expected
+
+
+def page_response(url: str, page_type: str = "article") -> Mock:
+    content = f"""<html><head>
+        <meta property="og:title" content="Title of {url}">
+        <meta property="og:description" content="Description">
+        <meta property="og:image" content="{url}image.png">
+        <meta property="og:url" content="{url}">
+        <meta property="og:type" content="{page_type}">
+    </head><body></body></html>"""
+    response = Mock(status_code=200, headers={})
+    response.iter_content.return_value = [content.encode()]
+    return response
+
+
+@pytest.mark.django_db
+class TestBookmarkImport:
+    url = reverse("bookmark-import")
+
+    @pytest.fixture(autouse=True)
+    def clear_metadata_cache(self) -> None:
+        cache.delete_pattern("bookmark_metadata_*")
+
+    def test_requires_urls_or_file(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        response = api_client.post(self.url, data={"urls": []})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"non_field_errors": ["Provide list of urls or bookmarks file."]}
+
+    def test_imports_list_of_urls(self, api_client: APIClient, user: UserFactory) -> None:
+        data = {"urls": ["https://example.com/", "https://example.com/missing", "https://example.org/"]}
+
+        def request_data(url: str, **kwargs) -> Mock:
+            if url == "https://example.com/missing":
+                return Mock(status_code=404, headers={})
+            return page_response(url)
+
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with patch.object(BookmarkService, "request_data", side_effect=request_data) as mocked_request_data:
+            response = api_client.post(self.url, data=data)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert all(call.kwargs["stream"] for call in mocked_request_data.call_args_list)
+        bookmarks = {bookmark.page_url: bookmark for bookmark in Bookmark.objects.filter(user=user)}
+        assert response.json() == [
+            {"url": "https://example.com/", "id": bookmarks["https://example.com/"].id, "status": "ready"},
+            {"url": "https://example.com/missing", "error": "Not found."},
+            {"url": "https://example.org/", "id": bookmarks["https://example.org/"].id, "status": "ready"},
+        ]
+        assert bookmarks["https://example.org/"].page_title == "Title of https://example.org/"
+
+    def test_fits_metadata_into_columns(self, api_client: APIClient, user: UserFactory) -> None:
+        long_url = f"https://example.org/{'a' * 300}"
+
+        def request_data(url: str, **kwargs) -> Mock:
+            response = page_response(url)
+            content = response.iter_content.return_value[0].decode()
+            if url == "https://example.com/":
+                content = content.replace("Title of", "T" * 200).replace(f"{url}image.png", f"{long_url}.png")
+            else:
+                content = content.replace(f'content="{url}"', f'content="{long_url}"')
+            response.iter_content.return_value = [content.encode()]
+            return response
+
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with patch.object(BookmarkService, "request_data", side_effect=request_data):
+            response = api_client.post(self.url, data={"urls": ["https://example.com/", "https://example.org/"]})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        bookmark = Bookmark.objects.get(user=user)
+        assert response.json() == [
+            {"url": "https://example.com/", "id": bookmark.id, "status": "ready"},
+            {"url": "https://example.org/", "error": "Url of the page is too long."},
+        ]
+        assert bookmark.page_title == "T" * 150 and bookmark.image_url is None
+
+    def test_saves_all_batches_or_none(self, user: UserFactory, settings) -> None:
+        settings.BOOKMARK_IMPORT_BATCH_SIZE = 1
+        bookmarks = [Bookmark(page_url="https://example.com/", user=user),
+                     Bookmark(page_url="https://example.org/", user=user)]
+        insert = QuerySet._insert
+        batches = []
+
+        def insert_batch(queryset: QuerySet, *args, **kwargs):
+            batches.append(args)
+            if len(batches) == 2:
+                raise DataError("value too long")
+            return insert(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, "_insert", insert_batch), pytest.raises(DataError):
+            BookmarkImportService.bulk_create(bookmarks, user)
+
+        assert not Bookmark.objects.filter(user=user).exists()
+
+    def test_reuses_cached_metadata_and_records_fetch_state(self, api_client: APIClient, user: UserFactory) -> None:
+        with patch.object(BookmarkService, "request_data", return_value=page_response("https://example.com/")):
+            BookmarkService.get_data("https://example.com/")
+
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with patch.object(BookmarkService, "request_data",
+                          side_effect=lambda url, **kwargs: page_response(url)) as request_data:
+            response = api_client.post(self.url, data={"urls": ["https://example.com/", "https://example.org/"]})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [call.args[0] if call.args else call.kwargs["url"] for call in request_data.call_args_list] == [
+            "https://example.org/"]
+        assert FetchState.objects.get(url=canonicalize_url("https://example.org/")).last_status == 200
+
+    def test_imports_netscape_bookmarks_file(self, api_client: APIClient, user: UserFactory) -> None:
+        content = b"""<!DOCTYPE NETSCAPE-Bookmark-file-1>
+            <DL><p>
+                <DT><H3>Folder</H3>
+                <DL><p>
+                    <DT><A HREF="https://example.com/" ADD_DATE="1701672900">Example</A>
+                    <DT><A HREF="javascript:alert(1)">Bookmarklet</A>
+                </DL><p>
+                <DT><A HREF="https://example.org/">Other example</A>
+            </DL><p>"""
+        bookmarks_file = SimpleUploadedFile("bookmarks.html", content, content_type="text/html")
+
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        with patch.object(BookmarkService, "request_data", side_effect=lambda url, **kwargs: page_response(url)):
+            response = api_client.post(self.url, data={"file": bookmarks_file}, format="multipart")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [result["url"] for result in response.json()] == ["https://example.com/", "https://example.org/"]
+        assert Bookmark.objects.filter(user=user).count() == 2
+
+
+@pytest.fixture
+def clear_sweep_lock() -> None:
+    cache.delete(BookmarkSweepService.LOCK_KEY)
+    yield
+    cache.delete(BookmarkSweepService.LOCK_KEY)
+
+
+def run_sweep() -> int:
+    """Sweep the way update_bookmark_data task runs it, shards are checked one by one. Returns count of dead bookmarks"""
+    sweep = BookmarkSweepService.start()
+    if sweep is not None:
+        sweep_id, shards = sweep
+        for state_ids in shards:
+            BookmarkSweepService.run_shard(sweep_id, state_ids)
+    return Bookmark.objects.filter(status=Bookmark.StatusEnum.DEAD).count()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("clear_sweep_lock")
+class TestUpdateUserBookmarks:
+    def test_marks_only_not_found_bookmarks_as_dead(self, bookmarks: [BookmarkFactory]) -> None:
+        dead_bookmark, alive_bookmark, *_ = bookmarks
+
+        def request_data(url: str, **kwargs) -> Mock:
+            if url == dead_bookmark.page_url:
+                return Mock(status_code=404, headers={})
+            if url == alive_bookmark.page_url:
+                raise requests.Timeout()
+            return Mock(status_code=200, headers={})
+
+        with patch.object(BookmarkService, "request_data", side_effect=request_data):
+            count = run_sweep()
+
+        assert count == 1
+        assert Bookmark.objects.get(id=dead_bookmark.id).status == Bookmark.StatusEnum.DEAD
+        assert Bookmark.objects.filter(status=Bookmark.StatusEnum.READY).count() == len(bookmarks) - 1
+
+    def test_requests_shared_url_once(self, user: UserFactory) -> None:
+        BookmarkFactory(page_url="https://example.com/article#comments", user=user)
+        BookmarkFactory(page_url="https://EXAMPLE.com/article")
+        BookmarkFactory(page_url="https://example.com/other")
+
+        response = Mock(status_code=404, headers={})
+        with patch.object(BookmarkService, "request_data", return_value=response) as request_data:
+            count = run_sweep()
+
+        assert count == 3
+        assert sorted(call.args[0] for call in request_data.call_args_list) == [
+            "https://example.com/article",
+            "https://example.com/other",
+        ]
+        assert not Bookmark.objects.exclude(status=Bookmark.StatusEnum.DEAD).exists()
+
+    def test_marks_dead_bookmarks_with_update_per_chunk(self, user: UserFactory, settings,
+                                                        django_capture_on_commit_callbacks) -> None:
+        settings.BOOKMARK_SWEEP_CHUNK_SIZE = 2
+        settings.BOOKMARK_SWEEP_SHARDS = 1
+        bookmarks = BookmarkFactory.create_batch(5, user=user)
+        list_version = get_list_version(user.id)
+
+        response = Mock(status_code=404, headers={})
+        with patch.object(BookmarkService, "request_data", return_value=response), \
+                CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+            count = run_sweep()
+
+        assert count == len(bookmarks)
+        updates = [query for query in queries if query["sql"].startswith('UPDATE "bookmarks_bookmark" SET "status"')]
+        assert len(updates) == 3
+        assert not any(query["sql"].startswith('DELETE FROM "bookmarks_bookmark"') for query in queries)
+        assert get_list_version(user.id) == list_version + 1
+
+    def test_revives_dead_bookmarks(self, user: UserFactory) -> None:
+        bookmark = BookmarkFactory(user=user)
+        with patch.object(BookmarkService, "request_data", return_value=Mock(status_code=404, headers={})):
+            run_sweep()
+        FetchState.objects.update(next_check_at=timezone.now())
+
+        with patch.object(BookmarkService, "request_data", return_value=Mock(status_code=200, headers={})):
+            run_sweep()
+
+        bookmark.refresh_from_db()
+        assert bookmark.status == Bookmark.StatusEnum.READY
+        assert FetchState.objects.get().dead_since is None
+
+    def test_purges_bookmarks_dead_for_grace_period(self, user: UserFactory, settings) -> None:
+        settings.BOOKMARK_DEAD_PURGE_SECONDS = 60
+        dead_bookmark, recently_dead_bookmark = BookmarkFactory.create_batch(2, user=user)
+        with patch.object(BookmarkService, "request_data", return_value=Mock(status_code=404, headers={})):
+            run_sweep()
+        FetchState.objects.filter(url=canonicalize_url(dead_bookmark.page_url)).update(
+            dead_since=timezone.now() - timedelta(minutes=2))
+
+        assert UpdateUserBookmarksService.purge_dead_bookmarks() == 1
+        assert list(Bookmark.objects.all()) == [recently_dead_bookmark]
+
+    def test_revalidates_with_stored_validators(self, user: UserFactory) -> None:
+        bookmark = BookmarkFactory(user=user)
+        FetchState.objects.create(url=canonicalize_url(bookmark.page_url), etag='"v1"',
+                                  last_modified="Mon, 04 Dec 2023 06:55:00 GMT")
+
+        response = Mock(status_code=304, headers={})
+        with patch.object(BookmarkService, "request_data", return_value=response) as request_data:
+            count = run_sweep()
+
+        assert count == 0
+        assert request_data.call_args.kwargs["method"] == "HEAD"
+        assert request_data.call_args.kwargs["headers"] == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Mon, 04 Dec 2023 06:55:00 GMT",
+        }
+        state = FetchState.objects.get(url=canonicalize_url(bookmark.page_url))
+        assert state.etag == '"v1"'
+        assert state.last_status == 304
+        assert state.last_checked_at
+
+    def test_falls_back_to_get_if_head_not_allowed(self, user: UserFactory) -> None:
+        bookmark = BookmarkFactory(user=user)
+        responses = [Mock(status_code=405, headers={}), Mock(status_code=200, headers={"ETag": '"v2"'})]
+
+        with patch.object(BookmarkService, "request_data", side_effect=responses) as request_data:
+            run_sweep()
+
+        assert request_data.call_args.kwargs["stream"] is True
+        responses[1].close.assert_called_once()
+        assert FetchState.objects.get(url=canonicalize_url(bookmark.page_url)).etag == '"v2"'
+
+    def test_checks_only_due_urls(self, user: UserFactory) -> None:
+        due_bookmark = BookmarkFactory(user=user)
+        BookmarkFactory(user=user, fetch_state=FetchState.objects.create(
+            url="https://example.com/", next_check_at=timezone.now() + timedelta(hours=1)))
+
+        response = Mock(status_code=200, headers={})
+        with patch.object(BookmarkService, "request_data", return_value=response) as request_data:
+            run_sweep()
+
+        request_data.assert_called_once()
+        assert request_data.call_args.args[0] == canonicalize_url(due_bookmark.page_url)
+
+    def test_deletes_orphan_states(self, user: UserFactory) -> None:
+        FetchState.objects.create(url="https://example.com/")
+
+        with patch.object(BookmarkService, "request_data") as request_data:
+            run_sweep()
+
+        request_data.assert_not_called()
+        assert not FetchState.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("clear_sweep_lock")
+class TestBookmarkSweep:
+    def test_keeps_urls_of_host_in_one_shard(self) -> None:
+        states = [FetchState.objects.create(url=url) for url in (
+            "https://example.com/1", "https://example.org/1", "https://www.example.com/2", "https://example.org/2")]
+
+        shards = BookmarkSweepService.partition(states, shards_count=4)
+
+        assert sorted(map(sorted, shards)) == sorted(map(sorted, [[states[0].id, states[2].id],
+                                                                  [states[1].id, states[3].id]]))
+
+    def test_checks_shards_under_lock(self, user: UserFactory, settings) -> None:
+        settings.BOOKMARK_SWEEP_SHARDS = 8
+        dead_bookmark = BookmarkFactory(user=user, page_url="https://example.com/missing")
+        for host in ("example.org", "example.net", "example.info"):
+            BookmarkFactory(user=user, page_url=f"https://{host}/")
+
+        def request_data(url: str, **kwargs) -> Mock:
+            return Mock(status_code=404 if url == dead_bookmark.page_url else 200, headers={})
+
+        sweep_id, shards = BookmarkSweepService.start()
+        assert BookmarkSweepService.start() is None
+        with patch.object(BookmarkService, "request_data", side_effect=request_data) as mocked_request_data:
+            for state_ids in shards:
+                BookmarkSweepService.run_shard(sweep_id, state_ids)
+
+        assert len(shards) > 1 and mocked_request_data.call_count == 4
+        assert Bookmark.objects.get(id=dead_bookmark.id).status == Bookmark.StatusEnum.DEAD
+        assert not cache.client.get_client().exists(BookmarkSweepService.get_progress_key(sweep_id))
+        FetchState.objects.update(next_check_at=timezone.now())
+        assert BookmarkSweepService.start() is not None
+
+    def test_failed_shard_finishes_sweep(self, user: UserFactory, settings) -> None:
+        settings.BOOKMARK_SWEEP_SHARDS = 8
+        for host in ("example.com", "example.org", "example.net"):
+            BookmarkFactory(user=user, page_url=f"https://{host}/")
+        redis = cache.client.get_client()
+
+        sweep_id, shards = BookmarkSweepService.start()
+        failing_shard, *other_shards = shards
+        progress_key = BookmarkSweepService.get_progress_key(sweep_id)
+        with patch.object(UpdateUserBookmarksService, "check_states", side_effect=requests.ConnectionError()), \
+                pytest.raises(requests.ConnectionError):
+            BookmarkSweepService.run_shard(sweep_id, failing_shard)
+        assert (int(redis.hget(progress_key, "shards")), int(redis.hget(progress_key, "failed"))) == (
+            len(other_shards), 1)
+
+        with patch.object(BookmarkService, "request_data", return_value=Mock(status_code=200, headers={})):
+            for state_ids in other_shards:
+                BookmarkSweepService.run_shard(sweep_id, state_ids)
+
+        assert not redis.exists(progress_key)
+        FetchState.objects.update(next_check_at=timezone.now())
+        assert BookmarkSweepService.start() is not None
+
+
+class TestFetchStateSchedule:
+    @pytest.fixture(autouse=True)
+    def schedule_settings(self, settings) -> None:
+        settings.BOOKMARK_CHECK_MIN_INTERVAL_SECONDS = 60
+        settings.BOOKMARK_CHECK_MAX_INTERVAL_SECONDS = 600
+        settings.BOOKMARK_CHECK_BACKOFF = 2
+
+    def test_interval_grows_while_url_is_healthy(self) -> None:
+        state = FetchState(url="https://example.com/")
+
+        intervals = [FetchStateService.schedule(state, is_healthy=True).check_interval for _ in range(6)]
+
+        assert intervals == [60, 120, 240, 480, 600, 600]
+        assert state.next_check_at > timezone.now()
+
+    def test_interval_shrinks_after_failure(self) -> None:
+        state = FetchState(url="https://example.com/", check_interval=480)
+
+        FetchStateService.schedule(state, is_healthy=False)
+        assert (state.check_interval, state.failure_count) == (240, 1)
+        FetchStateService.schedule(state, is_healthy=True)
+        assert (state.check_interval, state.failure_count) == (480, 0)
+
+
+@pytest.mark.django_db
+class TestBookmarkMetadataCache:
+    url = "https://example.com/cached-article"
+
+    @pytest.fixture(autouse=True)
+    def clear_metadata_cache(self) -> None:
+        cache.delete(BookmarkService.get_metadata_cache_key(self.url))
+        yield
+        cache.delete(BookmarkService.get_metadata_cache_key(self.url))
+
+    def test_fetches_page_once(self) -> None:
+        with patch.object(BookmarkService, "request_data", return_value=page_response(self.url)) as request_data:
+            first = BookmarkService.get_data(self.url)
+            second = BookmarkService.get_data("https://EXAMPLE.com/cached-article#top")
+
+        request_data.assert_called_once()
+        assert first == second == (f"Title of {self.url}", "Description", f"{self.url}image.png", self.url, "article")
+
+    def test_caches_not_found_pages(self) -> None:
+        response = Mock(status_code=404, headers={})
+        with patch.object(BookmarkService, "request_data", return_value=response) as request_data:
+            for _ in range(2):
+                with pytest.raises(NotFound):
+                    BookmarkService.get_data(self.url)
+
+        request_data.assert_called_once()
+
+    def test_lock_outlives_fetch_with_retries(self, settings) -> None:
+        settings.BOOKMARK_REQUEST_TIMEOUT_SECONDS = 10
+        settings.BOOKMARK_HTTP_RETRIES = 3
+        settings.BOOKMARK_HTTP_MAX_BACKOFF_SECONDS = 30
+        response = page_response(self.url)
+
+        with patch.object(cache, "lock", wraps=cache.lock) as lock, \
+                patch.object(BookmarkService, "request_data", return_value=response):
+            BookmarkService.get_data(self.url)
+
+        assert lock.call_args.kwargs["timeout"] == 10 * 4 + 30 * 3
+
+
+@pytest.mark.django_db
+class TestFillBookmark:
+    def test_fills_pending_bookmark(self, user: UserFactory) -> None:
+        bookmark = BookmarkService.create_pending_bookmark(url="https://example.com/article?id=1", user=user)
+        data = ("Title", "Description", "https://example.com/image.png", "https://example.com/article", "article")
+
+        with patch.object(BookmarkService, "get_data", return_value=data):
+            BookmarkService.fill_bookmark(bookmark.id)
+
+        bookmark.refresh_from_db()
+        assert bookmark.status == Bookmark.StatusEnum.READY
+        assert (bookmark.page_title, bookmark.description, bookmark.image_url, bookmark.page_url,
+                bookmark.page_type) == data
+
+    def test_relinks_bookmark_to_state_of_new_url(self, user: UserFactory) -> None:
+        bookmark = BookmarkService.create_pending_bookmark(url="https://example.com/article?id=1", user=user)
+        UpdateUserBookmarksService.link_bookmarks()
+        data = ("Title", "Description", None, "https://example.com/article", "article")
+
+        with patch.object(BookmarkService, "get_data", return_value=data):
+            BookmarkService.fill_bookmark(bookmark.id)
+        UpdateUserBookmarksService.link_bookmarks()
+
+        bookmark.refresh_from_db()
+        assert bookmark.fetch_state.url == canonicalize_url("https://example.com/article")
+
+    def test_marks_bookmark_as_failed(self, user: UserFactory) -> None:
+        bookmark = BookmarkService.create_pending_bookmark(url="https://example.com/article", user=user)
+
+        with patch.object(BookmarkService, "get_data", side_effect=ParseError()):
+            BookmarkService.fill_bookmark(bookmark.id)
+
+        bookmark.refresh_from_db()
+        assert bookmark.status == Bookmark.StatusEnum.FAILED
+
+    @staticmethod
+    def long_page_response(title: str, image_url: str, page_url: str) -> Mock:
+        response = Mock(status_code=200, headers={})
+        response.iter_content.return_value = [f"""<html><head>
+            <meta property="og:title" content="{title}">
+            <meta property="og:description" content="Description">
+            <meta property="og:image" content="{image_url}">
+            <meta property="og:url" content="{page_url}">
+            <meta property="og:type" content="article">
+        </head></html>""".encode()]
+        return response
+
+    def test_fits_metadata_into_columns(self, user: UserFactory) -> None:
+        url = "https://example.com/long-title"
+        cache.delete(BookmarkService.get_metadata_cache_key(url))
+        bookmark = BookmarkService.create_pending_bookmark(url=url, user=user)
+        response = self.long_page_response("t" * 200, f"https://example.com/{'i' * 300}.png", url)
+
+        with patch.object(BookmarkService, "request_data", return_value=response):
+            BookmarkService.fill_bookmark(bookmark.id)
+
+        bookmark.refresh_from_db()
+        assert bookmark.status == Bookmark.StatusEnum.READY
+        assert (bookmark.page_title, bookmark.image_url) == ("t" * 150, None)
+
+    def test_marks_bookmark_with_too_long_url_as_failed(self, user: UserFactory) -> None:
+        url = "https://example.com/long-url"
+        cache.delete(BookmarkService.get_metadata_cache_key(url))
+        bookmark = BookmarkService.create_pending_bookmark(url=url, user=user)
+        response = self.long_page_response("Title", "https://example.com/image.png",
+                                           f"https://example.com/{'a' * 3000}")
+
+        with patch.object(BookmarkService, "request_data", return_value=response):
+            BookmarkService.fill_bookmark(bookmark.id)
+
+        bookmark.refresh_from_db()
+        assert (bookmark.status, bookmark.page_url) == (Bookmark.StatusEnum.FAILED, url)
+        assert not FetchState.objects.exists()
+
+    def test_marks_bookmark_as_failed_on_unexpected_error(self, user: UserFactory) -> None:
+        bookmark = BookmarkService.create_pending_bookmark(url="https://example.com/article", user=user)
+
+        with patch.object(BookmarkService, "get_data", side_effect=DataError()):
+            BookmarkService.fill_bookmark(bookmark.id)
+
+        bookmark.refresh_from_db()
+        assert bookmark.status == Bookmark.StatusEnum.FAILED
+
+
+@pytest.mark.django_db
+class TestBackfillBookmarkUrls:
+    def test_fills_missing_url_hashes(self, bookmarks: [BookmarkFactory]) -> None:
+        Bookmark.objects.update(url_hash=None, domain=None)
+
+        call_command("backfill_bookmark_urls", chunk_size=2, stdout=StringIO())
+
+        for bookmark in Bookmark.objects.all():
+            assert bookmark.url_hash == get_url_hash(bookmark.page_url)
+            assert bookmark.domain == get_url_domain(bookmark.page_url)
@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+
+from bookmarks.client import AsyncHttpClient, HttpClient, TokenBucket
+
+
+def make_client(**kwargs) -> HttpClient:
+    options = dict(rate_limit=1000, burst=1000, pool_hosts=10, pool_size=10, retries=2, backoff_factor=0,
+                   max_backoff=0)
+    options.update(kwargs)
+    return HttpClient(**options)
+
+
+class TestTokenBucket:
+    def test_waits_when_burst_is_spent(self) -> None:
+        clock = Mock(return_value=0.0)
+
+        def sleep(delay: float) -> None:
+            clock.return_value += delay
+
+        with patch("bookmarks.client.time.monotonic", clock), patch("bookmarks.client.time.sleep", sleep):
+            bucket = TokenBucket(rate=10, capacity=2)
+            for _ in range(4):
+                bucket.acquire()
+
+        assert clock.return_value == pytest.approx(0.2)
+
+
+class TestHttpClient:
+    def test_retries_throttled_responses(self) -> None:
+        client = make_client()
+        responses = [Mock(status_code=429, headers={"Retry-After": "1"}), Mock(status_code=200, headers={})]
+        with patch.object(client.session, "request", side_effect=responses) as request:
+            response = client.request("GET", "https://example.com/", timeout=1)
+
+        assert response.status_code == 200
+        assert request.call_count == 2
+
+    def test_returns_last_response_when_retries_exhausted(self) -> None:
+        client = make_client(retries=1)
+        with patch.object(client.session, "request", return_value=Mock(status_code=503, headers={})) as request:
+            response = client.request("GET", "https://example.com/", timeout=1)
+
+        assert response.status_code == 503
+        assert request.call_count == 2
+
+    def test_uses_one_bucket_per_host(self) -> None:
+        client = make_client(max_tracked_hosts=2)
+
+        assert client.get_bucket("example.com") is client.get_bucket("example.com")
+        client.get_bucket("example.org")
+        client.get_bucket("example.net")
+        assert list(client.buckets) == ["example.org", "example.net"]
+
+    def test_retry_delay_is_capped(self) -> None:
+        client = make_client(backoff_factor=1, max_backoff=5)
+
+        assert client.get_retry_delay(Mock(headers={"Retry-After": "3600"}), attempt=0) == 5
+        assert client.get_retry_delay(Mock(headers={}), attempt=1) == 2
+
+
+class TestAsyncHttpClient:
+    def test_retries_throttled_responses(self) -> None:
+        statuses = iter([503, 429, 200])
+
+        def handle(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(next(statuses), headers={"Retry-After": "0"}, content=b"page")
+
+        async def get() -> httpx.Response:
+            client = AsyncHttpClient(rate_limit=1000, burst=1000, max_connections=10, retries=2, backoff_factor=0,
+                                     max_backoff=0, transport=httpx.MockTransport(handle))
+            response = await client.request("GET", "https://example.com/", stream=True)
+            content = await response.aread()
+            await response.aclose()
+            return content
+
+        assert asyncio.run(get()) == b"page"
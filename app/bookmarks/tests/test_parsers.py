@@ -0,0 +1,96 @@
+import asyncio
+
+from bookmarks.parsers import aextract_head_metadata, extract_head_metadata, get_charset
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+    <title> Page &amp; title </title>
+    <meta property="og:title" content="OG title">
+    <meta property="og:title" content="Second OG title">
+    <meta name="twitter:description" content="Twitter description"/>
+    <meta name="description" content="Plain description">
+</head>
+<body><meta property="og:image" content="https://example.com/image.png"></body></html>"""
+
+
+def chunks(content: bytes, size: int = 7) -> list:
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+class TestExtractHeadMetadata:
+    def test_collects_meta_tags_and_title(self) -> None:
+        metadata = extract_head_metadata(chunks(PAGE.encode()))
+
+        assert metadata.title == "Page & title"
+        assert metadata.meta == {"og:title": "OG title", "twitter:description": "Twitter description"}
+        assert metadata.get("og:description", "twitter:description") == "Twitter description"
+
+    def test_stops_reading_after_head(self) -> None:
+        body = iter(chunks(PAGE.encode() + b"<p>" * 1000))
+
+        metadata = extract_head_metadata(body)
+
+        assert metadata.done
+        assert "og:image" not in metadata.meta
+        assert next(body, None) is not None
+
+    def test_reads_at_most_max_bytes(self) -> None:
+        metadata = extract_head_metadata(chunks(PAGE.encode()), max_bytes=50)
+
+        assert not metadata.done
+        assert metadata.meta == {}
+
+    def test_decodes_multibyte_characters_split_between_chunks(self) -> None:
+        page = '<head><meta property="og:title" content="Трейлер GTA 6"></head>'.encode("cp1251")
+
+        metadata = extract_head_metadata(chunks(page, size=3), encoding=get_charset("text/html; charset=windows-1251"))
+
+        assert metadata.get("og:title") == "Трейлер GTA 6"
+
+    def test_detects_encoding_from_meta_tags(self) -> None:
+        for charset_tag in ('<meta charset="windows-1251">',
+                            '<meta http-equiv="Content-Type" content="text/html; charset=windows-1251">'):
+            page = (f'<html><head>{charset_tag}<title>Новости</title>'
+                    f'<meta property="og:title" content="Трейлер GTA 6"></head></html>').encode("cp1251")
+
+            metadata = extract_head_metadata(chunks(page), encoding=get_charset("text/html", default=None))
+
+            assert (metadata.title, metadata.get("og:title")) == ("Новости", "Трейлер GTA 6")
+
+    def test_detects_encoding_declared_after_first_chunks(self) -> None:
+        page = ('<html><head><meta charset="windows-1251">' + " " * 2000
+                + '<meta property="og:title" content="Трейлер"></head>').encode("cp1251")
+
+        metadata = extract_head_metadata(chunks(page, size=100), encoding=None)
+
+        assert metadata.get("og:title") == "Трейлер" and metadata.done
+
+    def test_decodes_utf8_without_declared_encoding(self) -> None:
+        metadata = extract_head_metadata(chunks(PAGE.encode()), encoding=None)
+
+        assert metadata.title == "Page & title"
+
+
+class TestGetCharset:
+    def test_defaults_to_utf8(self) -> None:
+        assert get_charset(None) == "utf-8"
+        assert get_charset("text/html") == "utf-8"
+        assert get_charset("text/html; charset=unknown") == "utf-8"
+        assert get_charset('text/html; charset="ISO-8859-1"') == "iso8859-1"
+        assert get_charset("text/html", default=None) is None
+
+
+class TestAsyncExtractHeadMetadata:
+    def test_reads_async_chunks_until_head_end(self) -> None:
+        read = []
+
+        async def body():
+            for chunk in chunks(PAGE.encode() + b"<p>" * 1000):
+                read.append(chunk)
+                yield chunk
+
+        metadata = asyncio.run(aextract_head_metadata(body()))
+
+        assert metadata.title == "Page & title"
+        assert metadata.meta["og:title"] == "OG title"
+        assert len(read) < len(chunks(PAGE.encode() + b"<p>" * 1000))
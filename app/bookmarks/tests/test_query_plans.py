@@ -0,0 +1,105 @@
+from typing import List
+
+import pytest
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from bookmarks.models import SEARCH_CONFIG, Bookmark
+from bookmarks.services import UpdateUserBookmarksService
+from bookmarks.tests.factories import BookmarkFactory
+from users.tests.factories import UserFactory
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Query plans are checked only on PostgreSQL"),
+]
+
+
+@pytest.fixture(autouse=True)
+def disable_seq_scan(db) -> None:
+    """Tables in tests are tiny, so seq scan is cheaper for planner. Without it a missing index shows up as Seq Scan"""
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("SET LOCAL enable_bitmapscan = off")
+
+
+@pytest.fixture
+def authorized_client(api_client: APIClient, user: UserFactory) -> APIClient:
+    access_token, _ = Token.objects.get_or_create(user=user)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+    return api_client
+
+
+def explain(sql: str) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}")
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+
+def assert_index_only_plans(queries: List[dict], table: str) -> None:
+    """Every query to the table is served by index, without sequential scan and without sorting"""
+    sqls = [query["sql"] for query in queries if f'"{table}"' in query["sql"] and query["sql"].startswith("SELECT")]
+    assert sqls, f"No queries to {table}"
+    for sql in sqls:
+        plan = explain(sql)
+        assert "Seq Scan" not in plan, f"{sql}\n{plan}"
+        assert "Sort" not in plan, f"{sql}\n{plan}"
+
+
+class TestBookmarkQueryPlans:
+    def test_list_first_page(self, authorized_client: APIClient, bookmarks: [BookmarkFactory]) -> None:
+        with CaptureQueriesContext(connection) as context:
+            authorized_client.get(reverse("bookmark-create"))
+
+        assert_index_only_plans(context.captured_queries, Bookmark._meta.db_table)
+
+    def test_list_next_page(self, authorized_client: APIClient, bookmarks: [BookmarkFactory]) -> None:
+        next_page = authorized_client.get(f"{reverse('bookmark-create')}?page_size=2").json()["next"]
+
+        with CaptureQueriesContext(connection) as context:
+            authorized_client.get(next_page)
+
+        assert_index_only_plans(context.captured_queries, Bookmark._meta.db_table)
+
+    def test_retrieve(self, authorized_client: APIClient, bookmark: BookmarkFactory) -> None:
+        with CaptureQueriesContext(connection) as context:
+            authorized_client.get(reverse("bookmark", args=[bookmark.id]))
+
+        assert_index_only_plans(context.captured_queries, Bookmark._meta.db_table)
+
+    @pytest.mark.parametrize("params", [
+        {"page_type": "article"},
+        {"domain": "example.com"},
+        {"created_after": "2020-01-01T00:00:00Z", "created_before": "2030-01-01T00:00:00Z"},
+        {"ordering": "created_at"},
+    ])
+    def test_filtered_list(self, authorized_client: APIClient, bookmarks: [BookmarkFactory], params: dict) -> None:
+        with CaptureQueriesContext(connection) as context:
+            authorized_client.get(reverse("bookmark-create"), params)
+
+        assert_index_only_plans(context.captured_queries, Bookmark._meta.db_table)
+
+
+class TestSearchQueryPlans:
+    def test_search_vector_index(self, bookmarks: [BookmarkFactory]) -> None:
+        """On tiny table planner prefers user index, so the GIN index is checked for search condition alone"""
+        search_query = SearchQuery("python", config=SEARCH_CONFIG, search_type="websearch")
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_bitmapscan = on")  # GIN index is read by bitmap scans only
+
+        plan = Bookmark.objects.filter(search_vector=search_query).explain()
+        assert "bookmark_search_vector_idx" in plan, plan
+
+
+class TestSweepQueryPlans:
+    def test_due_states(self, bookmarks: [BookmarkFactory]) -> None:
+        UpdateUserBookmarksService.link_bookmarks()
+
+        with CaptureQueriesContext(connection) as context:
+            UpdateUserBookmarksService.get_due_states()
+
+        assert_index_only_plans(context.captured_queries, "bookmarks_fetchstate")
@@ -0,0 +1,31 @@
+import pytest
+
+from bookmarks.utils import canonicalize_url, get_url_domain, get_url_hash
+
+
+class TestCanonicalizeUrl:
+    @pytest.mark.parametrize("url, expected", [
+        ("HTTPS://Example.COM", "https://example.com/"),
+        ("https://example.com:443/a#comments", "https://example.com/a"),
+        ("http://example.com:8080/a", "http://example.com:8080/a"),
+        ("https://example.com/a?utm_source=tg&b=2&fbclid=x&a=1&UTM_Medium=m", "https://example.com/a?a=1&b=2"),
+        ("https://example.com/a?q=&q=1", "https://example.com/a?q=&q=1"),
+        ("http://[::1]:8000/a", "http://[::1]:8000/a"),
+    ])
+    def test_canonicalizes_url(self, url: str, expected: str) -> None:
+        assert canonicalize_url(url) == expected
+
+    def test_same_page_has_same_hash(self) -> None:
+        url_hash = get_url_hash("https://example.com/a?b=2&a=1&utm_campaign=x")
+
+        assert url_hash == get_url_hash("https://EXAMPLE.com/a?a=1&b=2")
+
+
+class TestGetUrlDomain:
+    @pytest.mark.parametrize("url, expected", [
+        ("https://WWW.Example.com./a", "example.com"),
+        ("http://user@blog.example.com:8080/", "blog.example.com"),
+        ("http://[::1]:8000/a", "::1"),
+    ])
+    def test_returns_domain(self, url: str, expected: str) -> None:
+        assert get_url_domain(url) == expected
@@ -1,8 +1,19 @@
 from django.urls import path
 
-from bookmarks.views import BookmarkCreateAPIView, BookmarkAPIView
+from bookmarks.views import (
+    BookmarkAPIView,
+    BookmarkCreateAPIView,
+    BookmarkExportAPIView,
+    BookmarkFacetsAPIView,
+    BookmarkImportAPIView,
+    BookmarkSearchAPIView,
+)
 
 urlpatterns = [
     path("", BookmarkCreateAPIView.as_view(), name="bookmark-create"),
+    path("import/", BookmarkImportAPIView.as_view(), name="bookmark-import"),
+    path("search/", BookmarkSearchAPIView.as_view(), name="bookmark-search"),
+    path("facets/", BookmarkFacetsAPIView.as_view(), name="bookmark-facets"),
+    path("export/", BookmarkExportAPIView.as_view(), name="bookmark-export"),
     path("<int:pk>", BookmarkAPIView.as_view(), name="bookmark")
 ]
\ No newline at end of file
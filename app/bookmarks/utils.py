@@ -0,0 +1,43 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {"fbclid", "gclid", "yclid", "msclkid", "dclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl"}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of url, so links to the same page compare equal: lowercase scheme and host,
+    no default port, no fragment, no tracking params and sorted query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").rstrip(".")
+    if ":" in netloc:
+        netloc = f"[{netloc}]"  # IPv6 address
+    if parts.username or parts.password:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not is_tracking_param(name))
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+def get_url_hash(url: str) -> str:
+    return hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
+
+
+def get_url_domain(url: str) -> str:
+    """Lowercase host of url without `www.`, so bookmarks of one site are grouped together"""
+    host = (urlsplit(url.strip()).hostname or "").rstrip(".")
+    return host[4:] if host.startswith("www.") else host
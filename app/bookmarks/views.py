@@ -1,39 +1,86 @@
+from typing import Optional
+
 from django.conf import settings
-from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework import status
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.generics import CreateAPIView, ListAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from bookmarks.cache import BookmarkListCache, payload_response, render_payload
 from bookmarks.models import Bookmark
-from bookmarks.serializers import BookmarkSerializer, BookmarkCreateSerializer
-from bookmarks.services import BookmarkService
+from bookmarks.pagination import BookmarkCursorPagination, BookmarkSearchPagination
+from bookmarks.serializers import (
+    BookmarkSerializer,
+    BookmarkCreateSerializer,
+    BookmarkExportSerializer,
+    BookmarkFilterSerializer,
+    BookmarkImportSerializer,
+    BookmarkListFilterSerializer,
+    BookmarkListSerializer,
+    BookmarkSearchSerializer,
+)
+from bookmarks.services import (
+    BookmarkExportService,
+    BookmarkFilterService,
+    BookmarkImportService,
+    BookmarkSearchService,
+    BookmarkService,
+)
+from bookmarks.tasks import fetch_bookmark_data
+
+
+def render_list_page(request: Request, bookmarks: QuerySet, fields: Optional[tuple],
+                     paginator: Optional[BookmarkCursorPagination] = None) -> dict:
+    """Page of bookmark list rendered for BookmarkListCache"""
+    paginator = paginator or BookmarkCursorPagination()
+    serializer = BookmarkListSerializer(fields=fields)
+    ordering_columns = [field.lstrip("-") for field in paginator.ordering]
+    columns = dict.fromkeys((*serializer.columns, *ordering_columns))
+    page = paginator.paginate_queryset(bookmarks.values(*columns), request)
+    return render_payload(paginator.get_paginated_response(serializer.to_representation(page)).data)
+
+
+FIELDS_PARAMETER = OpenApiParameter(
+    "fields", str, description=f"Comma separated fields to return, any of: {', '.join(BookmarkSerializer.Meta.fields)}")
 
 
 class BookmarkCreateAPIView(ListCreateAPIView):
     serializer_class = BookmarkCreateSerializer
+    pagination_class = BookmarkCursorPagination
 
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = self.request.user
+        if settings.BOOKMARK_ASYNC_CREATE:
+            bookmark = BookmarkService.create_pending_bookmark(url=serializer.validated_data["url"], user=user)
+            transaction.on_commit(lambda: fetch_bookmark_data(bookmark.id))
+            return Response(BookmarkSerializer(bookmark).data, status=status.HTTP_202_ACCEPTED)
         bookmark = BookmarkService.save_bookmark(url=serializer.validated_data["url"], user=user)
         return Response(BookmarkSerializer(bookmark).data, status=status.HTTP_201_CREATED)
 
     def get_queryset(self):
         return Bookmark.objects.filter(user=self.request.user)
 
+    @extend_schema(parameters=[FIELDS_PARAMETER, BookmarkListFilterSerializer])
     def get(self, request, *args, **kwargs):
-        user = self.request.user
-        cached_data = cache.get(f"cached_bookmarks_{user.id}")
-        if cached_data:
-            return Response(cached_data, status=status.HTTP_200_OK)
-        serializer = BookmarkSerializer(self.get_queryset(), many=True)
-        cache.set(
-            f"cached_bookmarks_{user.id}",
-            serializer.data,
-            timeout=settings.CACHE_EXPIRATION_SECONDS,
-        )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        self.requested_fields = BookmarkSerializer.get_requested_fields(request.query_params)
+        filter_serializer = BookmarkListFilterSerializer(data=request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        self.filters = filter_serializer.validated_data
+        list_cache = BookmarkListCache(self.request.user.id, request.query_params)
+        payload = list_cache.get_or_build(self.build_list)
+        return payload_response(request, payload)
+
+    def build_list(self) -> dict:
+        bookmarks = BookmarkFilterService.filter(self.get_queryset(), self.filters)
+        return render_list_page(self.request, bookmarks, self.requested_fields, paginator=self.paginator)
 
     def get_serializer_class(self):
         if self.request.method == "POST":
@@ -42,6 +89,45 @@ class BookmarkCreateAPIView(ListCreateAPIView):
             return BookmarkSerializer
 
 
+class BookmarkFacetsAPIView(APIView):
+    """Counts of bookmarks per page_type and per domain, for filters of the list"""
+
+    @extend_schema(parameters=[BookmarkFilterSerializer],
+                   responses={200: OpenApiResponse(description='{"page_type": [{"value": "article", "count": 1}], '
+                                                               '"domain": [{"value": "example.com", "count": 1}]}')})
+    def get(self, request, *args, **kwargs):
+        filter_serializer = BookmarkFilterSerializer(data=request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        bookmarks = BookmarkFilterService.filter(Bookmark.objects.filter(user=request.user),
+                                                 filter_serializer.validated_data)
+        list_cache = BookmarkListCache(request.user.id, request.query_params, namespace="facets")
+        payload = list_cache.get_or_build(lambda: render_payload(BookmarkFilterService.get_facets(bookmarks)))
+        return payload_response(request, payload)
+
+
+class BookmarkExportAPIView(APIView):
+    """All bookmarks of user as NDJSON or CSV file, streamed while they are read from database"""
+
+    @extend_schema(parameters=[FIELDS_PARAMETER, BookmarkExportSerializer],
+                   responses={(200, "application/x-ndjson"): OpenApiResponse(OpenApiTypes.STR, "Bookmark per line"),
+                              (200, "text/csv"): OpenApiResponse(OpenApiTypes.STR, "Bookmark per row, with header")})
+    def get(self, request, *args, **kwargs):
+        fields = BookmarkSerializer.get_requested_fields(request.query_params)
+        serializer = BookmarkExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        export_format = serializer.validated_data["export_format"]
+        bookmarks = BookmarkFilterService.filter(Bookmark.objects.filter(user=request.user),
+                                                 serializer.validated_data)
+        chunks = BookmarkExportService.export(bookmarks, fields, export_format)
+        filename, content_type = f"bookmarks.{export_format}", BookmarkExportService.content_types[export_format]
+        if serializer.validated_data["gzip"]:
+            chunks = BookmarkExportService.compress(chunks)
+            filename, content_type = f"{filename}.gz", "application/gzip"
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class BookmarkAPIView(RetrieveUpdateDestroyAPIView):
     http_method_names = (
         "get",
@@ -50,5 +136,53 @@ class BookmarkAPIView(RetrieveUpdateDestroyAPIView):
     )
     serializer_class = BookmarkSerializer
 
+    @extend_schema(parameters=[FIELDS_PARAMETER])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_requested_fields(self) -> Optional[tuple]:
+        """Sparse fieldsets are applied to reads only, updates are validated and returned with all fields"""
+        if self.request.method != "GET":
+            return None
+        return BookmarkSerializer.get_requested_fields(self.request.query_params)
+
+    def get_queryset(self):
+        queryset = Bookmark.objects.all().filter(user=self.request.user)
+        fields = self.get_requested_fields()
+        if fields is not None:
+            queryset = queryset.only("id", *BookmarkSerializer.get_sources(fields))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+
+class BookmarkImportAPIView(CreateAPIView):
+    serializer_class = BookmarkImportSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        urls, user = serializer.validated_data["urls"], self.request.user
+        if settings.BOOKMARK_ASYNC_CREATE:
+            results = BookmarkImportService.import_pending_bookmarks(urls=urls, user=user)
+            bookmark_ids = [result["id"] for result in results]
+            transaction.on_commit(lambda: [fetch_bookmark_data(bookmark_id) for bookmark_id in bookmark_ids])
+            return Response(results, status=status.HTTP_202_ACCEPTED)
+        results = BookmarkImportService.import_bookmarks(urls=urls, user=user)
+        return Response(results, status=status.HTTP_201_CREATED)
+
+
+class BookmarkSearchAPIView(ListAPIView):
+    serializer_class = BookmarkSerializer
+    pagination_class = BookmarkSearchPagination
+
+    @extend_schema(parameters=[BookmarkSearchSerializer])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        return Bookmark.objects.all().filter(user=self.request.user)
+        serializer = BookmarkSearchSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return BookmarkSearchService.search(query=serializer.validated_data["q"], user=self.request.user)
@@ -0,0 +1,54 @@
+import json
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, ParseError
+from rest_framework.renderers import JSONRenderer
+
+from users.authentication import CachedTokenAuthentication
+
+
+def json_response(data, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    """Rendered by DRF renderer, so responses are the same as responses of sync views"""
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Base of async Django views, which serve the same API as DRF views under ASGI without a thread per request.
+    DRF runs only sync views, so token authentication, JSON body and API errors are handled here.
+    """
+    authentication = CachedTokenAuthentication()
+    authentication_required = True
+
+    async def authenticate(self, request: HttpRequest) -> None:
+        user_auth = await self.authentication.aauthenticate(request)
+        if user_auth is None:
+            raise NotAuthenticated()
+        request.user, request.auth = user_auth
+
+    async def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        try:
+            if self.authentication_required:
+                await self.authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            return self.handle_exception(e)
+
+    def handle_exception(self, exc: APIException) -> HttpResponse:
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = json_response(data, exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = self.authentication.authenticate_header(request=None)
+        return response
+
+    @staticmethod
+    def get_data(request: HttpRequest) -> dict:
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            raise ParseError()
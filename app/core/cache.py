@@ -0,0 +1,60 @@
+import asyncio
+import weakref
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.asyncio import Redis
+from redis.asyncio.lock import Lock
+
+
+class AsyncCache:
+    """
+    Non-blocking access to the default Redis cache from async views. Django's `cache.aget` and friends run
+    the sync client in a thread, this one talks to Redis from the event loop. Keys and values are encoded
+    by django-redis client, so both sides read what the other one wrote.
+    """
+
+    def __init__(self) -> None:
+        # redis.asyncio connections belong to the event loop they were opened in
+        self.connections = weakref.WeakKeyDictionary()
+
+    def get_connection(self) -> Redis:
+        loop = asyncio.get_running_loop()
+        connection = self.connections.get(loop)
+        if connection is None:
+            connection = self.connections[loop] = Redis.from_url(settings.CACHES["default"]["LOCATION"])
+        return connection
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = await self.get_connection().get(cache.make_key(key))
+        return default if value is None else cache.client.decode(value)
+
+    async def get_many(self, keys: list) -> Dict[str, Any]:
+        values = await self.get_connection().mget([cache.make_key(key) for key in keys])
+        return {key: cache.client.decode(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set(self, key: str, value: Any, timeout: Optional[float] = None) -> None:
+        px = int(timeout * 1000) if timeout is not None else None
+        await self.get_connection().set(cache.make_key(key), cache.client.encode(value), px=px)
+
+    async def set_many(self, data: Dict[str, Any], timeout: Optional[float] = None) -> None:
+        async with self.get_connection().pipeline(transaction=False) as pipeline:
+            for key, value in data.items():
+                px = int(timeout * 1000) if timeout is not None else None
+                pipeline.set(cache.make_key(key), cache.client.encode(value), px=px)
+            await pipeline.execute()
+
+    async def add(self, key: str, value: Any, timeout: Optional[float] = None) -> bool:
+        px = int(timeout * 1000) if timeout is not None else None
+        return bool(await self.get_connection().set(cache.make_key(key), cache.client.encode(value), px=px, nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self.get_connection().delete(cache.make_key(key))
+
+    def lock(self, key: str, timeout: Optional[float] = None) -> Lock:
+        """Same lock as `cache.lock(key)` of django-redis"""
+        return self.get_connection().lock(cache.make_key(key), timeout=timeout)
+
+
+async_cache = AsyncCache()
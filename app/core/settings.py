@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 env = environ.Env()
 
@@ -108,6 +109,24 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher hashes new passwords, the rest verify old ones, which are rehashed on successful login.
+# argon2 and bcrypt need the optional argon2-cffi and bcrypt packages.
+PASSWORD_HASHER_CLASSES = {
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "bcrypt": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHER = env.str("PASSWORD_HASHER", default="pbkdf2")
+if PASSWORD_HASHER not in PASSWORD_HASHER_CLASSES:
+    raise ImproperlyConfigured(f"PASSWORD_HASHER must be one of: {', '.join(PASSWORD_HASHER_CLASSES)}")
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    *(hasher for name, hasher in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+PASSWORD_HASHER_WORKERS = env.int("PASSWORD_HASHER_WORKERS", default=4)  # threads hashing passwords of async logins
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
 
@@ -131,7 +150,7 @@ REST_FRAMEWORK = {
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ),
 }
 
@@ -150,6 +169,44 @@ REDIS_HOST = env.str("REDIS_HOST", default="localhost")
 REDIS_PORT = env.int("REDIS_PORT", default=6379)
 REDIS_DB = env.int("REDIS_DB", default=0)
 CACHE_EXPIRATION_SECONDS = env.int("CACHE_EXPIRATION_SECONDS", default=60*60)
+BOOKMARK_CACHE_LOCK_SECONDS = env.int("BOOKMARK_CACHE_LOCK_SECONDS", default=10)
+BOOKMARK_CACHE_GZIP = env.bool("BOOKMARK_CACHE_GZIP", default=True)
+
+# Authentication
+AUTH_TOKEN_CACHE_SECONDS = env.int("AUTH_TOKEN_CACHE_SECONDS", default=300)
+AUTH_TOKEN_LOCAL_CACHE_SECONDS = env.float("AUTH_TOKEN_LOCAL_CACHE_SECONDS", default=5.0)
+AUTH_TOKEN_LOCAL_CACHE_SIZE = env.int("AUTH_TOKEN_LOCAL_CACHE_SIZE", default=1024)
+
+# Bookmarks
+BOOKMARK_ASYNC_CREATE = env.bool("BOOKMARK_ASYNC_CREATE", default=False)
+BOOKMARK_PAGE_SIZE = env.int("BOOKMARK_PAGE_SIZE", default=50)
+BOOKMARK_MAX_PAGE_SIZE = env.int("BOOKMARK_MAX_PAGE_SIZE", default=500)
+BOOKMARK_FACET_DOMAINS = env.int("BOOKMARK_FACET_DOMAINS", default=100)  # most common domains in facets
+BOOKMARK_EXPORT_CHUNK_SIZE = env.int("BOOKMARK_EXPORT_CHUNK_SIZE", default=2000)  # rows per server-side cursor fetch
+BOOKMARK_REQUEST_TIMEOUT_SECONDS = env.float("BOOKMARK_REQUEST_TIMEOUT_SECONDS", default=10.0)
+BOOKMARK_HEAD_MAX_BYTES = env.int("BOOKMARK_HEAD_MAX_BYTES", default=512*1024)
+BOOKMARK_METADATA_CACHE_SECONDS = env.int("BOOKMARK_METADATA_CACHE_SECONDS", default=60*60*24)
+BOOKMARK_METADATA_NEGATIVE_CACHE_SECONDS = env.int("BOOKMARK_METADATA_NEGATIVE_CACHE_SECONDS", default=60*5)
+BOOKMARK_SWEEP_CONCURRENCY = env.int("BOOKMARK_SWEEP_CONCURRENCY", default=32)
+BOOKMARK_IMPORT_MAX_URLS = env.int("BOOKMARK_IMPORT_MAX_URLS", default=5000)
+BOOKMARK_IMPORT_CONCURRENCY = env.int("BOOKMARK_IMPORT_CONCURRENCY", default=32)
+BOOKMARK_IMPORT_BATCH_SIZE = env.int("BOOKMARK_IMPORT_BATCH_SIZE", default=500)
+BOOKMARK_SWEEP_BATCH_SIZE = env.int("BOOKMARK_SWEEP_BATCH_SIZE", default=1000)
+BOOKMARK_SWEEP_SHARDS = env.int("BOOKMARK_SWEEP_SHARDS", default=4)  # tasks checking urls in parallel, by host
+BOOKMARK_SWEEP_LOCK_SECONDS = env.int("BOOKMARK_SWEEP_LOCK_SECONDS", default=60*15)  # upper bound of one sweep
+BOOKMARK_SWEEP_CHUNK_SIZE = env.int("BOOKMARK_SWEEP_CHUNK_SIZE", default=500)  # urls per UPDATE/DELETE of bookmarks
+BOOKMARK_DEAD_PURGE_SECONDS = env.int("BOOKMARK_DEAD_PURGE_SECONDS", default=60*60*24*30)  # 0 keeps dead bookmarks
+BOOKMARK_CHECK_MIN_INTERVAL_SECONDS = env.int("BOOKMARK_CHECK_MIN_INTERVAL_SECONDS", default=60*60)
+BOOKMARK_CHECK_MAX_INTERVAL_SECONDS = env.int("BOOKMARK_CHECK_MAX_INTERVAL_SECONDS", default=60*60*24*7)
+BOOKMARK_CHECK_BACKOFF = env.float("BOOKMARK_CHECK_BACKOFF", default=2.0)
+BOOKMARK_HTTP_RATE_LIMIT = env.float("BOOKMARK_HTTP_RATE_LIMIT", default=5.0)  # requests per second per host
+BOOKMARK_HTTP_BURST = env.int("BOOKMARK_HTTP_BURST", default=10)
+BOOKMARK_HTTP_POOL_HOSTS = env.int("BOOKMARK_HTTP_POOL_HOSTS", default=100)
+BOOKMARK_HTTP_POOL_SIZE = env.int("BOOKMARK_HTTP_POOL_SIZE", default=10)
+BOOKMARK_HTTP_ASYNC_MAX_CONNECTIONS = env.int("BOOKMARK_HTTP_ASYNC_MAX_CONNECTIONS", default=500)
+BOOKMARK_HTTP_RETRIES = env.int("BOOKMARK_HTTP_RETRIES", default=3)
+BOOKMARK_HTTP_BACKOFF_FACTOR = env.float("BOOKMARK_HTTP_BACKOFF_FACTOR", default=0.5)
+BOOKMARK_HTTP_MAX_BACKOFF_SECONDS = env.float("BOOKMARK_HTTP_MAX_BACKOFF_SECONDS", default=30.0)
 
 # Huey
 HUEY = {
@@ -166,8 +223,9 @@ HUEY = {
         "url": None,
     },
     "consumer": {
-        "workers": 1,
-        "worker_type": "thread",
+        # coordinator of the sweep and all its shards run at once, otherwise shards queue behind each other
+        "workers": env.int("HUEY_WORKERS", default=BOOKMARK_SWEEP_SHARDS + 1),
+        "worker_type": env.str("HUEY_WORKER_TYPE", default="thread"),  # thread, greenlet or process
         "initial_delay": 0.1,
         "backoff": 1.15,
         "max_delay": 10.0,
@@ -22,6 +22,11 @@ api_urls = [
     path("bookmarks/", include("bookmarks.urls"))
 ]
 
+# async views of the same API for ASGI deployment
+async_api_urls = [
+    path("bookmarks/", include("bookmarks.async_urls")),
+]
+
 docs_urls = [
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
@@ -35,4 +40,5 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include(docs_urls)),
     path("api/v1/", include(api_urls)),
+    path("api/v1/async/", include(async_api_urls)),
 ]
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from django.http import HttpRequest
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.cache import async_cache
+from users.models import User
+
+
+class LocalTokenCache:
+    """
+    Small LRU of cached tokens in memory of the process. Entries live only a few seconds,
+    because eviction on logout can't reach other processes.
+    """
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            entry = self.tokens.get(key)
+            if entry is None:
+                return None
+            cached_token, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.tokens[key]
+                return None
+            self.tokens.move_to_end(key)
+        return cached_token
+
+    def set(self, key: str, cached_token: dict) -> None:
+        with self.lock:
+            self.tokens[key] = (cached_token, time.monotonic() + self.ttl)
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > self.size:
+                self.tokens.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.tokens.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.tokens.clear()
+
+
+local_token_cache = LocalTokenCache(size=settings.AUTH_TOKEN_LOCAL_CACHE_SIZE,
+                                    ttl=settings.AUTH_TOKEN_LOCAL_CACHE_SECONDS)
+
+
+def get_token_cache_key(key: str) -> str:
+    """Tokens are credentials, so Redis keys contain only their hashes"""
+    return f"auth_token_{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def evict_cached_token(key: str) -> None:
+    local_token_cache.delete(key)
+    cache.delete(get_token_cache_key(key))
+
+
+def evict_user_tokens(user_ids: Iterable[int]) -> None:
+    """
+    Signals evict tokens of the saved user, but queryset update() doesn't send them,
+    so code like User.objects.filter(...).update(is_active=False) must call it with ids of updated users.
+    """
+    for key in Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True):
+        evict_cached_token(key)
+
+
+def dump_token(token: Token) -> dict:
+    """Only what authentication needs is cached, the rest of the user stays in database"""
+    return {"user_id": token.user_id, "is_active": token.user.is_active, "created": token.created}
+
+
+def load_token(key: str, cached_token: dict) -> Tuple[User, Token]:
+    """
+    Token and its user built from cache without queries. The user has only id and is_active, other fields
+    are deferred and loaded from database on access, so views which need them should load the user.
+    """
+    user = User.from_db(DEFAULT_DB_ALIAS, ["id", "is_active"], [cached_token["user_id"], cached_token["is_active"]])
+    token = Token.from_db(DEFAULT_DB_ALIAS, ["key", "user_id", "created"],
+                          [key, cached_token["user_id"], cached_token["created"]])
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, which looks up tokens in process memory, then in Redis and only then in database"""
+
+    def authenticate_credentials(self, key: str) -> Tuple[User, Token]:
+        cached_token = local_token_cache.get(key)
+        if cached_token is None:
+            cached_token = self.get_token(key)
+            local_token_cache.set(key, cached_token)
+        return self.check_token(key, cached_token)
+
+    def check_token(self, key: str, cached_token: dict) -> Tuple[User, Token]:
+        if not cached_token["is_active"]:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+        return load_token(key, cached_token)
+
+    def get_token(self, key: str) -> dict:
+        cache_key = get_token_cache_key(key)
+        cached_token = cache.get(cache_key)
+        if cached_token is not None:
+            return cached_token
+        try:
+            token = self.get_model().objects.select_related("user").get(key=key)
+        except self.get_model().DoesNotExist:
+            raise AuthenticationFailed(_("Invalid token."))
+        cached_token = dump_token(token)
+        cache.set(cache_key, cached_token, timeout=settings.AUTH_TOKEN_CACHE_SECONDS)
+        return cached_token
+
+    async def aauthenticate(self, request: HttpRequest) -> Optional[Tuple[User, Token]]:
+        """`authenticate` for async Django views, which don't go through DRF request"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(_("Invalid token header. Token string should not contain spaces."))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_("Invalid token header. Token string should not contain invalid characters."))
+
+        cached_token = local_token_cache.get(key)
+        if cached_token is None:
+            cached_token = await self.aget_token(key)
+            local_token_cache.set(key, cached_token)
+        return self.check_token(key, cached_token)
+
+    async def aget_token(self, key: str) -> dict:
+        cache_key = get_token_cache_key(key)
+        cached_token = await async_cache.get(cache_key)
+        if cached_token is not None:
+            return cached_token
+        try:
+            token = await self.get_model().objects.select_related("user").aget(key=key)
+        except self.get_model().DoesNotExist:
+            raise AuthenticationFailed(_("Invalid token."))
+        cached_token = dump_token(token)
+        await async_cache.set(cache_key, cached_token, timeout=settings.AUTH_TOKEN_CACHE_SECONDS)
+        return cached_token
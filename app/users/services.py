@@ -1,9 +1,19 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password, make_password
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
 
 from users.models import User
 
+# hashing is CPU bound, the pool bounds how many cores a burst of logins can take
+password_hasher_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHER_WORKERS,
+                                              thread_name_prefix="password-hasher")
+
 
 class UserAuthService:
     @classmethod
@@ -18,6 +28,41 @@ class UserAuthService:
             raise AuthenticationFailed()
         return cls.user_token(user)
 
+    @classmethod
+    async def alogin_user(cls, user_data: dict) -> str:
+        """
+        Same checks as `authenticate` with ModelBackend, but only hashing runs in the thread pool,
+        database is queried by async ORM. Outdated hash is replaced by hash of the preferred hasher.
+        """
+        loop = asyncio.get_running_loop()
+        password = user_data["password"]
+        user = await User.objects.filter(username=user_data["username"]).afirst()
+        if user is None:
+            # hash anyway, so response time doesn't tell whether the user exists
+            await loop.run_in_executor(password_hasher_executor, make_password, password)
+            raise AuthenticationFailed()
+
+        is_correct, new_password = await loop.run_in_executor(
+            password_hasher_executor, cls.verify_password, password, user.password)
+        if not is_correct or not user.is_active:
+            raise AuthenticationFailed()
+        if new_password is not None:
+            user.password = new_password
+            await user.asave(update_fields=["password"])
+        access_token, _ = await Token.objects.aget_or_create(user=user)
+        return access_token.key
+
+    @staticmethod
+    def verify_password(password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+        """Whether password is correct, and its new hash when the stored one has to be upgraded"""
+        new_password = None
+
+        def setter(raw_password: str) -> None:
+            nonlocal new_password
+            new_password = make_password(raw_password)
+
+        return check_password(password, encoded, setter), new_password
+
     @classmethod
     def user_token(cls, user: User) -> str:
         access_token, _ = Token.objects.get_or_create(user=user)
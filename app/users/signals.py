@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import evict_cached_token, evict_user_tokens
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def evict_token_on_delete(sender, instance, **kwargs):
+    """Logout and deletion of user, which deletes tokens by cascade"""
+    evict_cached_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def evict_tokens_on_user_update(sender, instance, created, **kwargs):
+    if created:
+        return
+    evict_user_tokens([instance.pk])
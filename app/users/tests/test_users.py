@@ -1,9 +1,13 @@
 import pytest
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
+from users.authentication import evict_user_tokens, get_token_cache_key, local_token_cache
+from users.models import User
 from users.tests.factories import UserFactory
 
 
@@ -42,6 +46,48 @@ class TestUserLogin:
         assert response.data["access_token"]
 
 
+@pytest.mark.django_db
+class TestUserLoginAsync:
+    url = reverse("user-login-async")
+
+    def test_requires_fields(self, api_client: APIClient) -> None:
+        response = api_client.post(self.url)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"username": ["This field is required."], "password": ["This field is required."]}
+
+    def test_rejects_malformed_json(self, api_client: APIClient) -> None:
+        response = api_client.post(self.url, data="{", content_type="application/json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"detail": "Malformed request."}
+
+    def test_requires_valid_data(self, api_client: APIClient, user: UserFactory) -> None:
+        for data in ({"username": "wrong_username", "password": "password123"},
+                     {"username": user.username, "password": "wrong_password"}):
+            response = api_client.post(self.url, data=data)
+
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+            assert response.json() == {"detail": "Incorrect authentication credentials."}
+
+    def test_return_access_token(self, api_client: APIClient, user: UserFactory) -> None:
+        response = api_client.post(self.url, data={"username": user.username, "password": "password123"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"access_token": Token.objects.get(user=user).key}
+
+    def test_rehashes_password_with_preferred_hasher(self, api_client: APIClient, user: UserFactory) -> None:
+        user.password = make_password("password123", hasher="pbkdf2_sha1")
+        user.save(update_fields=["password"])
+
+        response = api_client.post(self.url, data={"username": user.username, "password": "password123"})
+
+        assert response.status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.password.startswith("pbkdf2_sha256$")
+        assert user.check_password("password123")
+
+
 @pytest.mark.django_db
 class TestUserRegistration:
     url = reverse("user-registration")
@@ -174,3 +220,59 @@ class TestUserProfile:
         api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
         response = api_client.delete(self.url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    url = reverse("user-profile")
+
+    def test_cached_token_doesnt_touch_database(self, api_client: APIClient, user: UserFactory,
+                                                django_assert_num_queries) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        api_client.get(self.url)
+
+        # the only query loads the profile, the token is taken from the cache
+        with django_assert_num_queries(1):
+            assert api_client.get(self.url).status_code == status.HTTP_200_OK
+        local_token_cache.clear()
+        with django_assert_num_queries(1):
+            assert api_client.get(self.url).json()["username"] == user.username
+
+    def test_caches_only_fields_needed_for_authentication(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        api_client.get(self.url)
+
+        assert cache.get(get_token_cache_key(access_token.key)) == {
+            "user_id": user.id, "is_active": True, "created": access_token.created}
+
+    def test_queryset_update_evicts_token_with_helper(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        api_client.get(self.url)
+
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        evict_user_tokens([user.pk])
+
+        assert api_client.get(self.url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_logout_evicts_token(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        api_client.get(self.url)
+
+        api_client.post(reverse("user-logout"))
+
+        assert api_client.get(self.url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_profile_update_and_delete_evict_token(self, api_client: APIClient, user: UserFactory) -> None:
+        access_token, _ = Token.objects.get_or_create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Token {access_token.key}")
+        api_client.get(self.url)
+
+        api_client.patch(self.url, data={"first_name": "Changed"})
+        assert api_client.get(self.url).json()["first_name"] == "Changed"
+
+        api_client.delete(self.url)
+        assert api_client.get(self.url).status_code == status.HTTP_401_UNAUTHORIZED
@@ -5,6 +5,8 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.async_views import AsyncAPIView, json_response
+from users.models import User
 from users.serializers import UserLoginSerializer, UserProfileSerializer, UserRegistrationSerializer
 from users.services import UserAuthService
 
@@ -33,6 +35,18 @@ class UserLoginAPIView(CreateAPIView):
         return Response(data={"access_token": access_token}, status=status.HTTP_200_OK)
 
 
+class UserLoginAsyncView(AsyncAPIView):
+    """Login for ASGI servers, password is checked in a bounded thread pool without blocking the event loop"""
+    http_method_names = ("post",)
+    authentication_required = False
+
+    async def post(self, request, *args, **kwargs):
+        serializer = UserLoginSerializer(data=self.get_data(request))
+        serializer.is_valid(raise_exception=True)
+        access_token = await UserAuthService.alogin_user(serializer.validated_data)
+        return json_response({"access_token": access_token})
+
+
 class UserLogout(APIView):
 
     def post(self, request, *args, **kwargs):
@@ -49,4 +63,5 @@ class UserProfileAPIView(RetrieveUpdateDestroyAPIView):
     serializer_class = UserProfileSerializer
 
     def get_object(self):
-        return self.request.user
+        # authentication gives user with only id and is_active loaded
+        return User.objects.get(pk=self.request.user.pk)